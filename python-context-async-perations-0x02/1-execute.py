@@ -1,29 +1,76 @@
 import sqlite3
+from collections import namedtuple
+from functools import partial
 from user_db import setup_database_execute
 
 
 class ExecuteQuery:
-    '''''reate a resuable context manager that take query as input and execute it, managing both connevction and query execution'''
-    def __init__(self, db_path, query, params=None):
+    '''''reate a resuable context manager that take query as input and execute it, managing both connevction and query execution
+
+    By default the full result is fetched with fetchall(). With stream=True
+    (or 'rows') __enter__ returns an iterator over the rows instead, and
+    stream='batches' an iterator over lists of rows; either way rows are
+    fetched chunk_size at a time and the connection stays open until
+    __exit__, so only one chunk is held in memory. record projects rows into
+    namedtuples: True names the fields after the result columns, or pass
+    field names or a namedtuple class.
+    '''
+    def __init__(self, db_path, query, params=None, stream=False, chunk_size=1000, record=None):
+        if stream not in (False, True, 'rows', 'batches'):
+            raise ValueError(f"stream must be False, True, 'rows' or 'batches', not {stream!r}")
         self.db_path = db_path
         self.query = query
         self.params = params or ()
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.record = record
         self.connection = None
         self.cursor = None
 
+    def _record_type(self):
+        '''The namedtuple class rows are projected into, or None
+
+        A statement without a result set, such as an UPDATE, has no rows to project.
+        '''
+        if not self.record or self.cursor.description is None:
+            return None
+        if isinstance(self.record, type) and issubclass(self.record, tuple):
+            return self.record
+        fields = [d[0] for d in self.cursor.description] if self.record is True else self.record
+        return namedtuple('Record', fields, rename=True)
+
+    def batches(self):
+        '''Yield lists of up to chunk_size rows from the executed query'''
+        record = self._record_type()
+        for rows in iter(partial(self.cursor.fetchmany, self.chunk_size), []):
+            yield list(map(record._make, rows)) if record else rows
+
+    def rows(self):
+        '''Yield the rows of the executed query one at a time'''
+        for rows in self.batches():
+            yield from rows
+
     def __enter__(self):
         '''Establishes a connection to db and cretae cursor:
         Return:
-            list: the result of the executed query
+            list: the result of the executed query, or an iterator over
+            its rows (or batches of rows) in streaming mode
         '''
         try:
             self.connection = sqlite3.connect(self.db_path)
             self.cursor = self.connection.cursor()
             self.cursor.execute(self.query, self.params)
-            return self.cursor.fetchall()
-        except sqlite3.DatabaseError as e:
+            if self.stream == 'batches':
+                return self.batches()
+            if self.stream:
+                return self.rows()
+            rows = self.cursor.fetchall()
+            record = self._record_type()
+            return list(map(record._make, rows)) if record else rows
+        except Exception as e:
             if self.connection:
                 self.connection.rollback()
+                self.connection.close()
             raise e
 
 
@@ -31,6 +78,7 @@ class ExecuteQuery:
         if self.connection:
             if exc_type is None:
                 self.connection.commit()
+            self.cursor.close()
             self.connection.close()
 
 if __name__ == '__main__':
@@ -46,6 +94,11 @@ if __name__ == '__main__':
         for row in result:
             print('Query result', result)
 
+    ## Stream the same query in chunks, as named records
+    with ExecuteQuery(db_path, query, params, stream=True, chunk_size=2, record=True) as rows:
+        for row in rows:
+            print('Streamed row', row)
+
 
 
 
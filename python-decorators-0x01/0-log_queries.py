@@ -1,9 +1,97 @@
 import sqlite3
 import functools
 import os
+import atexit
+import threading
+import time
+from collections import deque
 from datetime import datetime
 
 from user_db_setup import setup_database_log_queries
+from query_metrics import profile_queries
+
+class QueryLogWriter:
+    """
+    Buffer query log lines in memory and append them to the log file from a
+    background thread, so a logged query never waits on file I/O.
+    The buffer holds at most capacity lines and is flushed whenever it holds
+    flush_size lines or flush_interval seconds have passed. When it is full
+    the policy decides: 'drop' discards the oldest line (ring buffer) and
+    counts it in dropped, 'block' makes the caller wait for the writer.
+    """
+    def __init__(self, path='query.log', capacity=10000, flush_size=100,
+                 flush_interval=1.0, policy='drop'):
+        if policy not in ('drop', 'block'):
+            raise ValueError("policy must be 'drop' or 'block'")
+        self.path = path
+        self.capacity = capacity
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.buffer = deque()
+        self.dropped = 0
+        self.written = 0
+        self.closed = False
+        self.condition = threading.Condition()
+        self.write_lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, name='query-log-writer', daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def log(self, line):
+        with self.condition:
+            if len(self.buffer) >= self.capacity:
+                if self.policy == 'drop':
+                    self.buffer.popleft()
+                    self.dropped += 1
+                else:
+                    self.condition.notify_all()
+                    self.condition.wait_for(lambda: len(self.buffer) < self.capacity or self.closed)
+            self.buffer.append(line)
+            if len(self.buffer) >= self.flush_size:
+                self.condition.notify_all()
+
+    def _drain(self):
+        with self.condition:
+            lines = list(self.buffer)
+            self.buffer.clear()
+            self.condition.notify_all()
+        return lines
+
+    def _write(self, lines):
+        if not lines:
+            return
+        with self.write_lock:
+            with open(self.path, 'a') as log_file:
+                log_file.writelines(lines)
+            self.written += len(lines)
+
+    def _run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(
+                    lambda: len(self.buffer) >= self.flush_size or self.closed,
+                    timeout=self.flush_interval)
+                if self.closed:
+                    return
+            self._write(self._drain())
+
+    def flush(self):
+        """Write everything buffered so far before returning"""
+        self._write(self._drain())
+
+    def close(self):
+        with self.condition:
+            if self.closed:
+                return
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
+        self.flush()
+
+
+query_log = QueryLogWriter('query.log')
+
 
 #### decorator to lof SQL queries
 def log_queries(func):
@@ -12,18 +100,32 @@ def log_queries(func):
     Complete the code below by writing a decorator log_queries that logs
     the SQL query before executing it.
         Prototype: def log_queries()
+    Each line also records how long the call took and how many rows it
+    returned, and goes through the buffered query_log writer.
     """
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         query = kwargs.get('query', '') if 'query' in kwargs else (args[0] if args else '')
-        if query:
-            with open('query.log', 'a') as log_file:
-                log_file.write(f"{datetime.now()}: Executing query: {query}\n")
-        return func(*args, **kwargs)
+        if not query:
+            return func(*args, **kwargs)
+        started_at = datetime.now()
+        start = time.perf_counter()
+        outcome = 'error'
+        rows = None
+        try:
+            result = func(*args, **kwargs)
+            outcome = 'ok'
+            rows = len(result) if isinstance(result, (list, tuple)) else None
+            return result
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            query_log.log(f"{started_at}: Executing query: {query} "
+                          f"[{outcome} {duration:.3f} ms, rows={rows}]\n")
     return wrapper
 
 
 @log_queries
+@profile_queries
 def fetch_all_users(query):
     conn = sqlite3.connect('users.db')
     cursor = conn.cursor()
@@ -1,22 +1,14 @@
 import os
 from datetime import datetime
-import sqlite3
 import functools
 
+from with_db_connection import with_db_connection
+from statement_cache import execute_cached
+from transactions import transaction
 from user_db_setup import setup_database_transactions
 
 #### decorator to manage DB transactions
 
-def with_db_connection(func):
-    """Open SQlLite Connection, passes it into the function, and ensure it closed"""
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
-            return func(conn, *args, **kwargs)
-        finally:
-            conn.close()
-    return wrapper
 
 def transactional(func):
     """
@@ -27,35 +19,32 @@ def transactional(func):
         - Roll back the transaction if an exception occurs during function execution.
         - Ensure the database connection is properly closed after the function execution, regardless of success or failure.
     Prototype: def transactional(func)
+    The transaction runs on the connection the function receives. Called
+    while that connection is already in a transaction (nested transactional
+    functions, or inside with_db_connection.unit_of_work) it becomes a
+    SAVEPOINT instead, so a failure only undoes its own work and the commit
+    happens once, in the outermost caller. Tables written inside are
+    invalidated in every cache_query cache after that commit.
     """
     @functools.wraps(func)
     def wrapper(conn, *args, **kwargs):
-        conn = sqlite3.connect('users.db')
         try:
-            conn.execute('BEGIN')
-            result = func(conn, *args, **kwargs)
-            conn.commit()
-            return result
+            with transaction(conn):
+                return func(conn, *args, **kwargs)
         except Exception as e:
-            conn.rollback()
             print(f"Transaction failed: {e}")
             raise
-        finally:
-            conn.close()
     return wrapper
 
 
 @with_db_connection 
 @transactional 
 def update_user_email(conn, user_id, new_email): 
-    cursor = conn.cursor() 
-    cursor.execute("UPDATE users SET email = ? WHERE id = ?", (new_email, user_id)) 
+    execute_cached(conn, "UPDATE users SET email = ? WHERE id = ?", (new_email, user_id))
 
 @with_db_connection
 def get_user_id(conn, user_id):
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
-    return cursor.fetchone()
+    return execute_cached(conn, "SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
 
 if __name__ == "__main__":
     ## setup the database
@@ -3,39 +3,106 @@ from datetime import datetime
 import sqlite3
 import functools
 import time
+import asyncio
+import inspect
 
+from with_db_connection import with_db_connection
+from retry_policies import BACKOFF_POLICIES
+from statement_cache import execute_cached
 from user_db_setup import setup_database_retry
 
-def with_db_connection(func):
-    """Open SQLite Connection, passes it into the function, and ensure it closed"""
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
-            return func(conn, *args, **kwargs)
-        finally:
-            conn.close()
-    return wrapper
-def retry_on_failure(retries=3, delay=2):
+def retry_on_failure(retries=3, delay=2, backoff='fixed', max_delay=30.0, budget=None,
+                     breaker=None, exceptions=(sqlite3.OperationalError,)):
     """
     Retry a database operation on failure of a transient error.
     Decorator that retries the function of a certain number of times if it raises an exception
     Args:
         retries (int): Number of retry attempts.
         delay (int): Delay in seconds between retries.
+        backoff (str): 'fixed', 'exponential' or 'decorrelated' (see retry_policies),
+            spreading out callers that failed at the same moment.
+        max_delay (float): Upper bound on any single delay.
+        budget (RetryBudget): Shared cap on retries; when spent, errors are raised at once.
+        breaker (CircuitBreaker): Fails fast with CircuitOpenError after repeated failures.
+        exceptions (tuple): Errors worth retrying.
+    Coroutine functions get an async wrapper that awaits asyncio.sleep
+    between attempts instead of blocking the thread.
     """
+    delays = BACKOFF_POLICIES[backoff]
+
+    def attempts(func_name):
+        """Yield before each attempt; yields the delay to wait first, or None"""
+        if budget is not None:
+            budget.deposit()
+        pending = delays(delay, max_delay)
+        for attempt in range(retries):
+            if breaker is not None:
+                breaker.allow()
+            if not attempt:
+                yield None
+                continue
+            if budget is not None and not budget.withdraw():
+                print(f"Retry budget exhausted for {func_name}.")
+                return
+            wait = next(pending)
+            print(f"Retrying in {wait:.2f} seconds (attempt {attempt + 1} of {retries})...")
+            yield wait
 
     def decorator(func):
+        def failed(e):
+            if breaker is not None:
+                breaker.record_failure()
+            print(f"{func.__name__} failed: {e}")
+
+        def succeeded():
+            if breaker is not None:
+                breaker.record_success()
+
+        def abandoned():
+            # neither a database failure nor a success, e.g. a ValueError or
+            # a cancellation: give up a half-open trial so another can run
+            if breaker is not None:
+                breaker.record_abandoned()
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                last_exception = None
+                for wait in attempts(func.__name__):
+                    try:
+                        if wait:
+                            await asyncio.sleep(wait)
+                        result = await func(*args, **kwargs)
+                    except exceptions as e:
+                        last_exception = e
+                        failed(e)
+                    except BaseException:
+                        abandoned()
+                        raise
+                    else:
+                        succeeded()
+                        return result
+                print("All retry attempts failed.")
+                raise last_exception
+            return async_wrapper
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
             last_exception = None
-            for attempt in range(retries):
+            for wait in attempts(func.__name__):
                 try:
-                    return func(*args, **kwargs)
-                except sqlite3.OperationalError as e:
+                    if wait:
+                        time.sleep(wait)
+                    result = func(*args, **kwargs)
+                except exceptions as e:
                     last_exception = e
-                    print(f"Attempt {attempt + 1} failed: {e}. Retrying in {delay} deconds...")
-                    time.sleep(delay)
+                    failed(e)
+                except BaseException:
+                    abandoned()
+                    raise
+                else:
+                    succeeded()
+                    return result
             print("All retry attempts failed.")
             raise last_exception
         return wrapper
@@ -47,9 +114,7 @@ def retry_on_failure(retries=3, delay=2):
 @retry_on_failure(retries=3, delay=1)
 
 def fetch_users_with_retry(conn):
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users")
-    return cursor.fetchall()
+    return execute_cached(conn, "SELECT * FROM users").fetchall()
 
 if __name__ == "__main__":
     ## setup the database
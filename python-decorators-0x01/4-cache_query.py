@@ -2,12 +2,16 @@ import os
 from datetime import datetime
 import sqlite3
 import functools
+import threading
 
 from user_db_setup import setup_database_cache
-from with_db_connection import with_db_connection
+from with_db_connection import with_db_connection, get_pool
+from statement_cache import execute_cached
+from query_cache import QueryCache, SingleFlight, SQLiteResultStore, freeze, tables_in
 
 # Decorator to cache query results
-def cache_query(func):
+def cache_query(func=None, *, max_entries=1024, max_bytes=64 * 1024 * 1024, ttl=300.0,
+                stale_while_revalidate=0.0, revalidate_with=None, shared_cache=None, l1_ttl=5.0):
     """
     Create a decorator that caches the results of database queries to avoid redundant database hits.
     The decorator should:
@@ -15,27 +19,75 @@ def cache_query(func):
         - Return the cached result if the same query parameters are used again.
         - Ensure that the cache is specific to each decorated function.
     Prototype: def cache_query(func)
+    The cache is a QueryCache bounded by max_entries and max_bytes with LRU
+    eviction and a per-entry ttl. Keys include the bound parameters passed
+    after the query, and writes committed through transactional drop the
+    entries of the tables they touch. Counters are on wrapper.cache.stats().
+    Concurrent misses on the same key run the query once and share the
+    result. With stale_while_revalidate seconds, an expired entry is still
+    served for that long while one background thread refreshes it on a
+    connection from revalidate_with() (the with_db_connection pool by default).
+    shared_cache (a SQLiteResultStore or the path of one) adds a second level
+    shared by every worker process and kept across restarts; the in-process
+    cache then keeps entries for at most l1_ttl seconds so invalidations made
+    by other processes are picked up quickly.
     """
-    query_cache = {}
+    if func is None:
+        return functools.partial(cache_query, max_entries=max_entries, max_bytes=max_bytes,
+                                 ttl=ttl, stale_while_revalidate=stale_while_revalidate,
+                                 revalidate_with=revalidate_with, shared_cache=shared_cache,
+                                 l1_ttl=l1_ttl)
+    if isinstance(shared_cache, str):
+        shared_cache = SQLiteResultStore(shared_cache)
+    query_cache = QueryCache(max_entries=max_entries, max_bytes=max_bytes, ttl=ttl,
+                             stale_ttl=stale_while_revalidate, store=shared_cache,
+                             namespace=f'{func.__module__}.{func.__qualname__}', l1_ttl=l1_ttl)
+    flights = SingleFlight()
+
+    def load(conn, key, query, args, kwargs):
+        since = query_cache.generation
+        result = func(conn, query, *args, **kwargs)
+        query_cache.put(key, result, tables_in(query), since=since)
+        return result
+
+    def revalidate(key, query, args, kwargs):
+        def refresh():
+            with (revalidate_with or get_pool().connection)() as conn:
+                return load(conn, key, query, args, kwargs)
+        try:
+            flights.do(key, refresh)
+        except Exception as e:
+            print(f"Background refresh failed for query: {query}: {e}")
 
     @functools.wraps(func)
     def wrapper(conn, query, *args, **kwargs):
-        if query in query_cache:
+        try:
+            key = (query, freeze(args), freeze(kwargs))
+            hash(key)
+        except TypeError:
+            return func(conn, query, *args, **kwargs)
+        state, result = query_cache.lookup(key)
+        if state == 'fresh':
             print(f"Fetching result from cache for query: {query}")
-            return query_cache[query]
+            return result
+        if state == 'stale':
+            if not flights.in_flight(key):
+                threading.Thread(target=revalidate, args=(key, query, args, kwargs),
+                                 daemon=True).start()
+            print(f"Serving stale result while refreshing query: {query}")
+            return result
 
-        result = func(conn, query, *args, **kwargs)
-        query_cache[query] = result
+        result = flights.do(key, lambda: load(conn, key, query, args, kwargs))
         print(f"Caching result for query: {query}")
         return result
+    wrapper.cache = query_cache
+    wrapper.flights = flights
     return wrapper
 
 @with_db_connection
 @cache_query
 def fetch_users_with_cache(conn, query):
-    cursor = conn.cursor()
-    cursor.execute(query)
-    return cursor.fetchall()
+    return execute_cached(conn, query).fetchall()
 
 if __name__ == "__main__":
     ## setup the database
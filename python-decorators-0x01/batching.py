@@ -0,0 +1,219 @@
+import functools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from transactions import bound_connection, transaction
+from with_db_connection import with_db_connection
+from user_db_setup import setup_database_transactions
+
+#### coalesce per-row calls into one statement (DataLoader style)
+
+
+class Batcher:
+    """
+    Collects calls to a per-row function and runs them together. func takes
+    the list of argument tuples of every call in the batch and returns one
+    result per call, in the same order. A batch runs as soon as it holds
+    max_size calls or max_wait seconds after its first call, whichever comes
+    first, and each caller gets its own result. If the batch fails, its
+    calls are run again one at a time, so one bad row only fails its own
+    caller.
+
+    Calling the Batcher blocks until the call has run. When no batch is
+    running or waiting the call runs straight away, on its own; calls that
+    arrive while one runs are queued and batched, which is where many
+    threads calling at once gain. A single thread calling in a loop gets
+    one statement per call this way: to batch its calls, submit() them all
+    and flush().
+
+    Calls made inside a with_db_connection.unit_of_work are not mixed with
+    other threads' calls: they are batched per thread and run on that
+    thread, and so on the unit of work's connection and transaction, when
+    it calls flush() (or the Batcher, which flushes) or reaches max_size.
+    Flush them before the unit of work ends. Otherwise a batch running on
+    another connection would wait for the caller's write lock.
+    """
+    def __init__(self, func, max_size=100, max_wait=0.005):
+        self.func = func
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self.lock = threading.Lock()
+        self.pending = []
+        self.local = threading.local()
+        self.timer = None
+        self.running = 0
+        self.calls = 0
+        self.batches = 0
+        self.split = 0
+
+    def submit(self, *args):
+        """Queue a call and return a Future for its result"""
+        future = Future()
+        if bound_connection() is not None:
+            pending = self._local_pending()
+            pending.append((args, future))
+            with self.lock:
+                self.calls += 1
+            if len(pending) >= self.max_size:
+                self._run(self._take_local())
+            return future
+        with self.lock:
+            self.pending.append((args, future))
+            self.calls += 1
+            if len(self.pending) >= self.max_size:
+                batch = self._take()
+            else:
+                batch = None
+                if self.timer is None:
+                    self.timer = threading.Timer(self.max_wait, self.flush)
+                    self.timer.daemon = True
+                    self.timer.start()
+        if batch:
+            self._run(batch)
+        return future
+
+    def __call__(self, *args):
+        if bound_connection() is None:
+            with self.lock:
+                idle = not self.pending and not self.running
+                if idle:
+                    self.calls += 1
+            if idle:
+                future = Future()
+                self._run([(args, future)])
+                return future.result()
+        future = self.submit(*args)
+        if not future.done() and bound_connection() is not None:
+            self.flush()
+        return future.result()
+
+    def flush(self):
+        """Run whatever is queued now, in the calling thread
+
+        Inside a unit_of_work only this thread's calls are run.
+        """
+        batch = self._take_local()
+        if batch:
+            self._run(batch)
+        if bound_connection() is not None:
+            return
+        with self.lock:
+            batch = self._take()
+        if batch:
+            self._run(batch)
+
+    def _local_pending(self):
+        pending = getattr(self.local, 'pending', None)
+        if pending is None:
+            pending = self.local.pending = []
+        return pending
+
+    def _take_local(self):
+        batch, self.local.pending = self._local_pending(), []
+        return batch
+
+    def _take(self):
+        batch, self.pending = self.pending, []
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        return batch
+
+    def _call(self, batch):
+        results = self.func([args for args, future in batch])
+        if len(results) != len(batch):
+            raise ValueError(f"{self.func.__name__} returned {len(results)} results "
+                             f"for {len(batch)} calls")
+        return results
+
+    def _run(self, batch):
+        with self.lock:
+            self.batches += 1
+            self.running += 1
+        try:
+            try:
+                results = self._call(batch)
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0][1].set_exception(e)
+                    return
+                # one bad call must not fail the others: run each on its own
+                with self.lock:
+                    self.split += 1
+                for item in batch:
+                    self._run([item])
+                return
+            for (args, future), result in zip(batch, results):
+                future.set_result(result)
+        except BaseException as e:
+            # every caller must be woken, even by a KeyboardInterrupt
+            for args, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                self.running -= 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                'calls': self.calls,
+                'batches': self.batches,
+                'split_batches': self.split,
+                'pending': len(self.pending),
+                'avg_batch': self.calls / self.batches if self.batches else 0.0,
+            }
+
+
+def batched(func=None, *, max_size=100, max_wait=0.005):
+    """
+    Decorator turning a function over a list of calls into a Batcher that
+    is called once per row. Usable bare (@batched) or with options. Keep
+    max_size below SQLite's limit on bound parameters when func builds an
+    IN (...) list.
+    """
+    if func is None:
+        return functools.partial(batched, max_size=max_size, max_wait=max_wait)
+    batcher = Batcher(func, max_size=max_size, max_wait=max_wait)
+    functools.update_wrapper(batcher, func)
+    return batcher
+
+
+@batched
+@with_db_connection
+def update_user_email(conn, calls):
+    """update_user_email(user_id, new_email), as one executemany per batch"""
+    with transaction(conn):
+        conn.executemany("UPDATE users SET email = ? WHERE id = ?",
+                         [(new_email, user_id) for user_id, new_email in calls])
+    return [None] * len(calls)
+
+
+@batched
+@with_db_connection
+def get_user_id(conn, calls):
+    """get_user_id(user_id), as one WHERE id IN (...) query per batch"""
+    ids = list({user_id for (user_id,) in calls})
+    placeholders = ', '.join('?' * len(ids))
+    rows = conn.execute(f"SELECT * FROM users WHERE id IN ({placeholders})", ids).fetchall()
+    by_id = {row[0]: row for row in rows}
+    return [by_id.get(user_id) for (user_id,) in calls]
+
+
+if __name__ == "__main__":
+    ## setup the database
+    setup_database_transactions()
+
+    #### concurrent callers share batches
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(lambda i: update_user_email(i % 4 + 1, f'user{i}@example.com'), range(200)))
+        users = list(executor.map(get_user_id, [1, 2, 3, 4] * 50))
+    print("Users:", users[:4])
+    print("update_user_email:", update_user_email.stats())
+    print("get_user_id:", get_user_id.stats())
+
+    #### one thread: submit everything, then flush
+    futures = [get_user_id.submit(user_id) for user_id in (1, 2, 3)]
+    get_user_id.flush()
+    print("User with ID 1:", futures[0].result())
@@ -0,0 +1,48 @@
+import sys
+import time
+
+import with_db_connection as db
+from statement_cache import execute_cached
+from user_db_setup import setup_database
+
+#### per-call overhead of get_user_by_id with and without the statement cache
+
+CALLS = 100000
+
+
+@db.with_db_connection
+def get_user_by_id_plain(conn, user_id):
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
+    return cursor.fetchone()
+
+
+@db.with_db_connection
+def get_user_by_id_cached(conn, user_id):
+    return execute_cached(conn, "SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
+
+
+def microseconds_per_call(func, calls, rows):
+    start = time.perf_counter()
+    for i in range(calls):
+        func(i % rows + 1)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+if __name__ == "__main__":
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else CALLS
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    setup_database(rows=rows, domain='connection.com')
+    variants = {
+        're-parse every call': (0, get_user_by_id_plain),
+        'statement cache': (256, get_user_by_id_plain),
+        'statement cache, counted': (256, get_user_by_id_cached),
+    }
+    for name, (cached_statements, func) in variants.items():
+        pool = db.configure_pool(per_thread=True, cached_statements=cached_statements)
+        func(1)
+        overhead = microseconds_per_call(func, calls, rows)
+        stats = pool.stats()
+        print(f"{name:>24}: {overhead:6.2f} us/call  "
+              f"(statements cached {stats['statements_cached']}, "
+              f"hits {stats['statement_hits']}, misses {stats['statement_misses']})")
@@ -0,0 +1,73 @@
+import functools
+import sqlite3
+import sys
+import time
+
+import with_db_connection as db
+from transactions import transaction
+from user_db_setup import setup_database
+
+#### 10k update_user_email calls: per-call connection and commit versus unit_of_work
+
+UPDATES = 10000
+
+
+def connect_and_commit_per_call(func):
+    """The original transactional: its own connection and one commit per call"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        conn = sqlite3.connect('users.db')
+        try:
+            conn.execute('BEGIN')
+            result = func(conn, *args, **kwargs)
+            conn.commit()
+            return result
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    return wrapper
+
+
+def transactional(func):
+    """2-transactional's decorator; importing that script would run its demo against users.db"""
+    @functools.wraps(func)
+    def wrapper(conn, *args, **kwargs):
+        with transaction(conn):
+            return func(conn, *args, **kwargs)
+    return wrapper
+
+
+def update_user_email(conn, user_id, new_email):
+    cursor = conn.cursor()
+    cursor.execute("UPDATE users SET email = ? WHERE id = ?", (new_email, user_id))
+
+
+def run(update, updates, rows):
+    start = time.perf_counter()
+    for i in range(updates):
+        update(i % rows + 1, f'user{i}@example.com')
+    return time.perf_counter() - start
+
+
+def unit_of_work(update, updates, rows):
+    with db.unit_of_work():
+        return run(update, updates, rows)
+
+
+if __name__ == "__main__":
+    updates = int(sys.argv[1]) if len(sys.argv) > 1 else UPDATES
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    setup_database(rows=rows, domain='transaction.com')
+    # synchronous=FULL, like the original connections, so every commit pays its fsync
+    db.configure_pool(journal_mode='WAL', connect_pragmas=('synchronous = FULL',))
+    pooled = db.with_db_connection(transactional(update_user_email))
+    variants = {
+        'connect + commit per call': (run, connect_and_commit_per_call(update_user_email)),
+        'pooled, commit per call': (run, pooled),
+        'unit_of_work, one commit': (unit_of_work, pooled),
+    }
+    for name, (runner, update) in variants.items():
+        seconds = runner(update, updates, rows)
+        print(f"{name:>26}: {seconds:8.3f}s  {updates / seconds:>10.0f} updates/sec")
@@ -0,0 +1,59 @@
+import functools
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import with_db_connection as db
+from user_db_setup import setup_database
+
+#### calls/sec of get_user_by_id: a fresh connection per call versus the pool
+
+CALLS = 20000
+THREADS = 4
+
+
+def connect_per_call(func):
+    """The original with_db_connection: open and close users.db on every call"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        conn = sqlite3.connect('users.db')
+        try:
+            return func(conn, *args, **kwargs)
+        finally:
+            conn.close()
+    return wrapper
+
+
+def get_user_by_id(conn, user_id):
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
+    return cursor.fetchone()
+
+
+def calls_per_second(func, calls, threads, rows):
+    def work(count):
+        for i in range(count):
+            func(i % rows + 1)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        list(executor.map(work, [calls // threads] * threads))
+    return calls / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else CALLS
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    setup_database(rows=rows, domain='connection.com')
+    variants = {
+        'connect per call': (None, connect_per_call),
+        'bounded pool': ({'size': THREADS}, db.with_db_connection),
+        'per-thread pool': ({'per_thread': True}, db.with_db_connection),
+    }
+    for name, (options, decorator) in variants.items():
+        if options is not None:
+            db.configure_pool(**options)
+        for threads in (1, THREADS):
+            rate = calls_per_second(decorator(get_user_by_id), calls, threads, rows)
+            print(f"{name:>18} {threads} thread(s): {rate:>10.0f} calls/sec")
@@ -0,0 +1,385 @@
+import hashlib
+import pickle
+import re
+import sqlite3
+import sys
+import threading
+import time
+import weakref
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future
+
+#### bounded TTL + LRU result cache used by cache_query
+
+_TABLES = re.compile(r'\b(?:FROM|JOIN|UPDATE|INTO)\s+["`\[]?(\w+)', re.I)
+# a whole FROM list, joins included, up to the next clause: FROM users u, orders o
+_FROM_LIST = re.compile(r'\bFROM\s+(.*?)(?=\b(?:WHERE|GROUP|ORDER|HAVING|LIMIT|WINDOW|'
+                        r'UNION|EXCEPT|INTERSECT)\b|;|$)', re.I | re.S)
+_LIST_ITEM = re.compile(r'\s*["`\[]?(\w+)')
+_INNERMOST = re.compile(r'\([^()]*\)')
+_WRITES = re.compile(r'^\s*(?:INSERT|UPDATE|DELETE|REPLACE|CREATE|DROP|ALTER)\b', re.I)
+
+_caches = weakref.WeakSet()
+_caches_lock = threading.Lock()
+
+
+def tables_in(query):
+    """Lower-cased names of the tables a statement reads or writes"""
+    names = _TABLES.findall(query)
+    # read each parenthesised group on its own, innermost first, so neither
+    # subqueries nor commas inside parentheses cut a FROM list short
+    parts = []
+    while True:
+        groups = _INNERMOST.findall(query)
+        if not groups:
+            break
+        parts.extend(groups)
+        query = _INNERMOST.sub(' ', query)
+    parts.append(query)
+    for from_list in (found for part in parts for found in _FROM_LIST.findall(part)):
+        for item in from_list.split(',')[1:]:
+            match = _LIST_ITEM.match(item)
+            if match:
+                names.append(match.group(1))
+    return frozenset(name.lower() for name in names)
+
+
+def written_tables(query):
+    """Tables a statement modifies, empty for reads"""
+    return tables_in(query) if _WRITES.match(query) else frozenset()
+
+
+def sizeof(value):
+    """Approximate the memory held by a query result, in bytes"""
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(sizeof(item) for item in value)
+    elif isinstance(value, dict):
+        size += sum(sizeof(k) + sizeof(v) for k, v in value.items())
+    return size
+
+
+def freeze(value):
+    """Turn lists and dicts inside bound parameters into hashable tuples"""
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze(item)) for key, item in value.items()))
+    return value
+
+
+class SQLiteResultStore:
+    """
+    A result cache shared by every process that opens the same file, and
+    kept across restarts. Values are pickled and zlib-compressed when that
+    pays off; keys are hashed. Each thread gets its own WAL-mode connection,
+    so readers in other workers never block on a writer.
+    """
+    COMPRESS_OVER = 1024
+
+    def __init__(self, path='query_cache.db', timeout=5.0):
+        self.path = path
+        self.timeout = timeout
+        self.local = threading.local()
+        conn = self._conn()
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                expires REAL
+            );
+            CREATE TABLE IF NOT EXISTS result_tables (
+                key TEXT NOT NULL,
+                table_name TEXT NOT NULL,
+                PRIMARY KEY (table_name, key)
+            ) WITHOUT ROWID;
+        ''')
+
+    def _conn(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = NORMAL')
+            self.local.conn = conn
+        return conn
+
+    @staticmethod
+    def digest(key):
+        return hashlib.blake2b(pickle.dumps(key, protocol=4), digest_size=20).hexdigest()
+
+    def get(self, key):
+        """
+        Return (True, value, tables, ttl) for an unexpired entry, where tables
+        are the ones it was stored with and ttl the seconds it has left (None
+        if it never expires), and (False, None, (), None) otherwise
+        """
+        conn = self._conn()
+        digest = self.digest(key)
+        now = time.time()
+        row = conn.execute(
+            'SELECT value, expires FROM results WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (digest, now)
+        ).fetchone()
+        if row is None:
+            return False, None, (), None
+        tables = frozenset(table for (table,) in conn.execute(
+            'SELECT table_name FROM result_tables WHERE key = ?', (digest,)))
+        blob, expires = row
+        data = zlib.decompress(blob[1:]) if blob[:1] == b'z' else blob[1:]
+        return True, pickle.loads(data), tables, None if expires is None else expires - now
+
+    def put(self, key, value, tables=(), ttl=None):
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        blob = b'z' + zlib.compress(data) if len(data) > self.COMPRESS_OVER else b'p' + data
+        digest = self.digest(key)
+        expires = time.time() + ttl if ttl is not None else None
+        conn = self._conn()
+        with _transaction(conn):
+            conn.execute('INSERT OR REPLACE INTO results (key, value, expires) VALUES (?, ?, ?)',
+                         (digest, blob, expires))
+            conn.executemany('INSERT OR IGNORE INTO result_tables (key, table_name) VALUES (?, ?)',
+                             [(digest, table) for table in tables])
+
+    def invalidate_tables(self, tables):
+        conn = self._conn()
+        with _transaction(conn):
+            for table in tables:
+                conn.execute('DELETE FROM results WHERE key IN '
+                             '(SELECT key FROM result_tables WHERE table_name = ?)', (table,))
+                conn.execute('DELETE FROM result_tables WHERE table_name = ?', (table,))
+
+    def purge_expired(self):
+        conn = self._conn()
+        with _transaction(conn):
+            conn.execute('DELETE FROM results WHERE expires <= ?', (time.time(),))
+            conn.execute('DELETE FROM result_tables WHERE key NOT IN (SELECT key FROM results)')
+
+    def clear(self):
+        conn = self._conn()
+        with _transaction(conn):
+            conn.execute('DELETE FROM results')
+            conn.execute('DELETE FROM result_tables')
+
+
+class _transaction:
+    """BEGIN IMMEDIATE ... COMMIT on an autocommit connection"""
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+
+
+class QueryCache:
+    """
+    A thread-safe result cache bounded by entry count and by approximate
+    size in bytes, evicting least recently used entries first. Entries
+    expire ttl seconds after they were stored (ttl=None keeps them until
+    evicted) and are dropped as soon as a table they read is invalidated.
+    For stale_ttl seconds after expiry lookup() still returns an entry,
+    marked stale, so it can be served while it is refreshed.
+    With a store (e.g. SQLiteResultStore) this cache becomes an L1 in front
+    of it: misses fall through to the store, results are written to both,
+    and invalidations reach both. Other processes only learn about an
+    invalidation through the store, so L1 entries then live at most l1_ttl,
+    after which the store is asked again; an entry is only served stale once
+    its real ttl has passed and the store no longer has it.
+    """
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024, ttl=300.0, stale_ttl=0.0,
+                 store=None, namespace='', l1_ttl=5.0):
+        self.store = store
+        self.namespace = namespace
+        self.l1_ttl = l1_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.generation = 0
+        self.entries = OrderedDict()
+        self.by_table = {}
+        self.bytes = 0
+        self.lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.stale_hits = 0
+        self.store_hits = 0
+        with _caches_lock:
+            _caches.add(self)
+
+    def _remove(self, key):
+        value, expires, size, tables, lifetime = self.entries.pop(key)
+        self.bytes -= size
+        for table in tables:
+            keys = self.by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.by_table[table]
+
+    def lookup(self, key):
+        """Return ('fresh' | 'stale' | 'miss', value)"""
+        state, value = self._lookup_local(key)
+        if state != 'fresh' and self.store is not None:
+            since = self.generation
+            found, stored, tables, ttl = self.store.get((self.namespace, key))
+            if found:
+                with self.lock:
+                    self.store_hits += 1
+                self._put_local(key, stored, tables, ttl, since)
+                return 'fresh', stored
+        if state == 'stale':
+            with self.lock:
+                self.stale_hits += 1
+        return state, value
+
+    def _lookup_local(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return 'miss', None
+            now = time.monotonic()
+            if entry[1] is not None and entry[1] <= now:
+                # entry[4] is when the result itself expires, later than
+                # entry[1] for an L1 copy capped at l1_ttl
+                lifetime = entry[4]
+                if lifetime is not None and lifetime <= now < lifetime + self.stale_ttl:
+                    return 'stale', entry[0]
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return 'miss', None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return 'fresh', entry[0]
+
+    def get(self, key):
+        """Return (True, value) on a fresh hit, (False, None) otherwise"""
+        state, value = self.lookup(key)
+        return (True, value) if state == 'fresh' else (False, None)
+
+    def put(self, key, value, tables=(), ttl=None, since=None):
+        """
+        Store value; since is the generation read before running the query,
+        and the value is discarded if any table was invalidated meanwhile.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        with self.lock:
+            if since is not None and since != self.generation:
+                return
+        if self.store is not None:
+            self.store.put((self.namespace, key), value, tables, ttl)
+        self._put_local(key, value, tables, ttl, since)
+
+    def _put_local(self, key, value, tables, ttl, since=None):
+        """
+        Store in L1. ttl is the entry's real lifetime, which sets when it may
+        be served stale; with a store the L1 copy itself expires after at
+        most l1_ttl so that the store is consulted again.
+        """
+        size = sizeof(value)
+        if size > self.max_bytes:
+            return
+        now = time.monotonic()
+        lifetime = now + ttl if ttl is not None else None
+        if self.store is not None:
+            ttl = self.l1_ttl if ttl is None else min(ttl, self.l1_ttl)
+        expires = now + ttl if ttl is not None else None
+        with self.lock:
+            if since is not None and since != self.generation:
+                return
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (value, expires, size, frozenset(tables), lifetime)
+            self.bytes += size
+            for table in tables:
+                self.by_table.setdefault(table, set()).add(key)
+            while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def invalidate_tables(self, tables):
+        with self.lock:
+            self.generation += 1
+            for table in tables:
+                for key in list(self.by_table.get(table, ())):
+                    self._remove(key)
+                    self.invalidations += 1
+        if self.store is not None:
+            self.store.invalidate_tables(tables)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.by_table.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'store_hits': self.store_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key: the first caller runs the
+    function, the others wait for it and share its result or exception.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.coalesced = 0
+
+    def in_flight(self, key):
+        with self.lock:
+            return key in self.calls
+
+    def do(self, key, func):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return call.result()
+        try:
+            result = func()
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self.lock:
+                del self.calls[key]
+
+
+def invalidate_tables(tables):
+    """Drop entries reading any of these tables from every live QueryCache"""
+    tables = [table.lower() for table in tables]
+    if not tables:
+        return
+    with _caches_lock:
+        caches = list(_caches)
+    for cache in caches:
+        cache.invalidate_tables(tables)
@@ -0,0 +1,145 @@
+import functools
+import json
+import re
+import threading
+import time
+from bisect import bisect_left
+
+#### per-query latency histograms, next to log_queries
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_COMMENTS = re.compile(r'--[^\n]*|/\*.*?\*/', re.S)
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_SPACES = re.compile(r'\s+')
+_LOOKS_LIKE_SQL = re.compile(r'^\s*(SELECT|INSERT|UPDATE|DELETE|REPLACE|WITH|PRAGMA)\b', re.I)
+
+
+def fingerprint(query):
+    """
+    Normalise a SQL statement so that queries differing only in literal
+    values share one fingerprint: comments removed, string and number
+    literals replaced by ?, IN lists collapsed and whitespace squeezed.
+    """
+    query = _COMMENTS.sub(' ', query)
+    query = _STRINGS.sub('?', query)
+    query = _NUMBERS.sub('?', query)
+    query = _IN_LISTS.sub('(?+)', query)
+    return _SPACES.sub(' ', query).strip().rstrip(';').rstrip()
+
+
+class QueryStats:
+    """Call count, error count and a latency histogram for one fingerprint"""
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.calls = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds, error):
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.calls += 1
+        self.errors += error
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def as_dict(self):
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'total_seconds': self.total,
+            'mean_seconds': self.total / self.calls if self.calls else 0.0,
+            'max_seconds': self.max,
+            'buckets': dict(zip([str(b) for b in self.buckets] + ['+Inf'], self.counts)),
+        }
+
+
+class QueryRegistry:
+    """Thread-safe in-process store of QueryStats keyed by query fingerprint"""
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.stats = {}
+        self.lock = threading.Lock()
+
+    def observe(self, key, seconds, error=False):
+        with self.lock:
+            stats = self.stats.get(key)
+            if stats is None:
+                stats = self.stats[key] = QueryStats(self.buckets)
+            stats.observe(seconds, error)
+
+    def snapshot(self):
+        """Return {fingerprint: stats dict}, slowest total time first"""
+        with self.lock:
+            items = [(key, stats.as_dict()) for key, stats in self.stats.items()]
+        items.sort(key=lambda item: item[1]['total_seconds'], reverse=True)
+        return dict(items)
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.snapshot(), **kwargs)
+
+    def to_prometheus(self, prefix='db_query'):
+        """Render the registry in the Prometheus text exposition format"""
+        lines = [
+            f'# HELP {prefix}_duration_seconds Query latency by fingerprint.',
+            f'# TYPE {prefix}_duration_seconds histogram',
+        ]
+        errors = [
+            f'# HELP {prefix}_errors_total Failed queries by fingerprint.',
+            f'# TYPE {prefix}_errors_total counter',
+        ]
+        for key, stats in self.snapshot().items():
+            label = key.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+            cumulative = 0
+            for bound, count in stats['buckets'].items():
+                cumulative += count
+                lines.append(f'{prefix}_duration_seconds_bucket{{query="{label}",le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_duration_seconds_sum{{query="{label}"}} {stats["total_seconds"]}')
+            lines.append(f'{prefix}_duration_seconds_count{{query="{label}"}} {stats["calls"]}')
+            errors.append(f'{prefix}_errors_total{{query="{label}"}} {stats["errors"]}')
+        return '\n'.join(lines + errors) + '\n'
+
+    def reset(self):
+        with self.lock:
+            self.stats.clear()
+
+
+REGISTRY = QueryRegistry()
+
+
+def _query_of(func, args, kwargs):
+    """The SQL passed to func, or a label naming func when it builds its own"""
+    query = kwargs.get('query')
+    if query is None:
+        query = next((arg for arg in args
+                      if isinstance(arg, str) and _LOOKS_LIKE_SQL.match(arg)), None)
+    return fingerprint(query) if query else f'<{func.__module__}.{func.__qualname__}>'
+
+
+def profile_queries(func=None, *, registry=REGISTRY):
+    """
+    Decorator recording the latency of every call in registry, grouped by
+    the fingerprint of the query passed as `query` (or the first argument
+    that looks like SQL). Functions that build their SQL internally are grouped under
+    their own name. Usable bare (@profile_queries) or with a registry.
+    """
+    if func is None:
+        return functools.partial(profile_queries, registry=registry)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        key = _query_of(func, args, kwargs)
+        start = time.perf_counter()
+        error = True
+        try:
+            result = func(*args, **kwargs)
+            error = False
+            return result
+        finally:
+            registry.observe(key, time.perf_counter() - start, error)
+    return wrapper
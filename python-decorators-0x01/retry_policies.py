@@ -0,0 +1,119 @@
+import random
+import sqlite3
+import threading
+import time
+
+#### backoff policies, retry budget and circuit breaker used by retry_on_failure
+
+
+def fixed_delays(delay, max_delay=None):
+    """The same delay before every retry"""
+    delay = delay if max_delay is None else min(delay, max_delay)
+    while True:
+        yield delay
+
+
+def exponential_delays(delay, max_delay=30.0):
+    """
+    Exponential backoff with full jitter: before retry n sleep a random time
+    in [0, delay * 2**n], capped at max_delay, so callers that failed
+    together do not retry together.
+    """
+    attempt = 0
+    while True:
+        yield random.uniform(0, min(max_delay, delay * 2 ** attempt))
+        attempt += 1
+
+
+def decorrelated_jitter(delay, max_delay=30.0):
+    """Decorrelated jitter: each sleep is random in [delay, 3 * previous sleep]"""
+    sleep = delay
+    while True:
+        sleep = min(max_delay, random.uniform(delay, sleep * 3))
+        yield sleep
+
+
+BACKOFF_POLICIES = {
+    'fixed': fixed_delays,
+    'exponential': exponential_delays,
+    'decorrelated': decorrelated_jitter,
+}
+
+
+class RetryBudget:
+    """
+    Caps retries at a fraction of calls so a struggling database is not hit
+    by a retry storm. Every call deposits ratio tokens and every retry
+    spends one. The budget starts with reserve tokens, so the first retries
+    are allowed before calls have paid for them; once spent, they are only
+    replenished by calls. One budget can be shared by several decorated
+    functions.
+    """
+    def __init__(self, ratio=0.2, reserve=10, max_tokens=100):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = float(reserve)
+        self.lock = threading.Lock()
+        self.rejected = 0
+
+    def deposit(self):
+        with self.lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self):
+        """Return True if a retry may go ahead"""
+        with self.lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            self.rejected += 1
+            return False
+
+
+class CircuitOpenError(sqlite3.OperationalError):
+    """Raised without touching the database while a CircuitBreaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Fails fast after failure_threshold consecutive failures. The circuit then
+    stays open for reset_timeout seconds, after which one trial call is let
+    through (half-open): success closes it again, failure reopens it. A
+    trial ending in an error that is not retried, or a cancellation, is
+    abandoned, and the next call becomes the trial.
+    """
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """Raise CircuitOpenError unless a call may be attempted now"""
+        with self.lock:
+            if self.state == 'closed':
+                return
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                return
+            raise CircuitOpenError(f"circuit open after {self.failures} consecutive failures")
+
+    def record_success(self):
+        with self.lock:
+            self.state = 'closed'
+            self.failures = 0
+
+    def record_abandoned(self):
+        """A trial call ended without a verdict: let the next call try again"""
+        with self.lock:
+            if self.state == 'half_open':
+                self.state = 'open'
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                self.state = 'open'
+                self.opened_at = time.monotonic()
@@ -0,0 +1,52 @@
+import sqlite3
+from collections import OrderedDict
+
+#### per-connection statement cache keyed by SQL text
+
+
+class CachingConnection(sqlite3.Connection):
+    """
+    sqlite3 connection that accounts for its prepared statements. sqlite3
+    already keeps the last cached_statements compiled statements of a
+    connection in an LRU keyed by SQL text; execute_cached mirrors that LRU
+    so the cache size and hit rate can be reported. A miss is a statement
+    compiled from scratch, a hit reuses the compiled one. SQLitePool opens
+    its connections with this class.
+
+    Cursors are not cached: a fresh one is cheaper than resetting an old
+    one, and it keeps earlier results intact. Statements run without
+    execute_cached also occupy sqlite3's cache, which makes the counts
+    approximate.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.statement_cache_size = kwargs.get('cached_statements', 128)
+        self.statements = OrderedDict()
+        self.statement_hits = 0
+        self.statement_misses = 0
+
+    def execute_cached(self, sql, parameters=()):
+        statements = self.statements
+        if sql in statements:
+            self.statement_hits += 1
+            statements.move_to_end(sql)
+        else:
+            self.statement_misses += 1
+            statements[sql] = None
+            if len(statements) > self.statement_cache_size:
+                statements.popitem(last=False)
+        return self.cursor().execute(sql, parameters)
+
+    def statement_stats(self):
+        return {
+            'size': len(self.statements),
+            'hits': self.statement_hits,
+            'misses': self.statement_misses,
+        }
+
+
+def execute_cached(conn, sql, parameters=()):
+    """Run sql through conn's statement cache, or plainly if it has none"""
+    if isinstance(conn, CachingConnection):
+        return conn.execute_cached(sql, parameters)
+    return conn.execute(sql, parameters)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Tests for the with_db_connection connection pool"""
+
+import gc
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+import with_db_connection as db
+from transactions import transaction
+
+
+class TestPerThreadPool(unittest.TestCase):
+    """SQLitePool in per_thread mode"""
+
+    def setUp(self):
+        """Point the shared pool at a fresh database"""
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'users.db')
+        conn = sqlite3.connect(self.path)
+        conn.execute('CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)')
+        conn.close()
+        self.pool = db.configure_pool(path=self.path, per_thread=True)
+
+    def tearDown(self):
+        self.pool.close()
+        self.directory.cleanup()
+
+    def test_nested_call_keeps_callers_transaction(self):
+        """A nested decorated call must not roll back the caller's transaction"""
+        @db.with_db_connection
+        def count(conn):
+            return conn.execute('SELECT COUNT(*) FROM users').fetchone()[0]
+
+        @db.with_db_connection
+        def insert_two(conn):
+            with transaction(conn):
+                conn.execute("INSERT INTO users (name) VALUES ('first')")
+                self.assertEqual(count(), 1)
+                conn.execute("INSERT INTO users (name) VALUES ('second')")
+
+        insert_two()
+        self.assertEqual(count(), 2)
+
+    def test_outermost_release_rolls_back(self):
+        """A transaction left open by the outermost borrow is rolled back"""
+        @db.with_db_connection
+        def leave_open(conn):
+            conn.execute("INSERT INTO users (name) VALUES ('uncommitted')")
+
+        leave_open()
+        with self.pool.connection() as conn:
+            self.assertFalse(conn.in_transaction)
+            self.assertEqual(conn.execute('SELECT COUNT(*) FROM users').fetchone()[0], 0)
+
+    def test_connection_closed_when_thread_exits(self):
+        """A per-thread connection is closed once its thread has exited"""
+        thread = threading.Thread(target=self.pool.acquire)
+        thread.start()
+        thread.join()
+        gc.collect()
+        self.assertEqual(self.pool.stats()['open'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import itertools
+import threading
+from contextlib import contextmanager
+
+from query_cache import invalidate_tables, written_tables
+
+#### SAVEPOINT-aware transactions shared by transactional and unit_of_work
+
+_local = threading.local()
+_savepoints = itertools.count(1)
+
+# sqlite3.Connection cannot be weakly referenced, so per-connection state is
+# keyed by id(); an entry lives exactly as long as its outermost transaction.
+_open = {}
+_open_lock = threading.Lock()
+
+
+def bound_connection():
+    """The connection a unit_of_work bound to this thread, or None"""
+    return getattr(_local, 'conn', None)
+
+
+def bind(conn):
+    _local.conn = conn
+
+
+def unbind():
+    _local.conn = None
+
+
+@contextmanager
+def transaction(conn):
+    """
+    Run the block in a transaction on conn. The outermost block issues
+    BEGIN/COMMIT; a block entered while conn is already in a transaction
+    becomes a SAVEPOINT that is released on success and rolled back to on
+    error, leaving the enclosing transaction usable. Tables written anywhere
+    inside are invalidated in every cache_query cache once the outermost
+    block commits, or when the savepoint is released if the enclosing
+    transaction was begun by the caller.
+    """
+    with _open_lock:
+        state = _open.get(id(conn))
+    if state is None and not conn.in_transaction:
+        written = set()
+        with _open_lock:
+            _open[id(conn)] = written
+        conn.set_trace_callback(lambda statement: written.update(written_tables(statement)))
+        try:
+            conn.execute('BEGIN')
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+        finally:
+            conn.set_trace_callback(None)
+            with _open_lock:
+                del _open[id(conn)]
+        invalidate_tables(written)
+        return
+
+    foreign = state is None
+    if foreign:
+        # a transaction the caller began itself: its commit is out of sight,
+        # so invalidate as soon as the savepoint is released
+        state = set()
+        conn.set_trace_callback(lambda statement: state.update(written_tables(statement)))
+    name = f'sp_{next(_savepoints)}'
+    try:
+        conn.execute(f'SAVEPOINT {name}')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute(f'ROLLBACK TO {name}')
+            conn.execute(f'RELEASE {name}')
+            raise
+        conn.execute(f'RELEASE {name}')
+    finally:
+        if foreign:
+            conn.set_trace_callback(None)
+    if foreign:
+        invalidate_tables(state)
@@ -1,152 +1,115 @@
+import argparse
 import os
+import random
 import sqlite3
+import time
 import uuid
+from itertools import islice
+
+DB_FILENAME = 'users.db'
+BATCH_SIZE = 10000
+ID_TYPES = {
+    'integer': 'INTEGER PRIMARY KEY AUTOINCREMENT',
+    'uuid': 'TEXT PRIMARY KEY',
+}
+FIRST_NAMES = ('Alice', 'Bob', 'Charlie', 'David', 'Eve', 'Frank', 'Grace', 'Heidi',
+               'Ivan', 'Judy', 'Mallory', 'Niaj', 'Olivia', 'Peggy', 'Rupert', 'Sybil',
+               'Trent', 'Uma', 'Victor', 'Walter')
+LAST_NAMES = ('Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller',
+              'Davis', 'Rodriguez', 'Martinez', 'Cartwright', 'Okafor', 'Nguyen', 'Kowalski')
+
+
+def generate_users(rows, seed=0, id_type='integer', domain='example.com'):
+    """
+    Yield rows (id, name, email) deterministically from seed: the same
+    arguments always give the same users. The first rows are the familiar
+    Alice, Bob, Charlie and David; ids are 1..rows or seeded UUIDs.
+    """
+    rng = random.Random(seed)
+    for i in range(rows):
+        if i < 4:
+            name = FIRST_NAMES[i]
+        else:
+            name = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+        if id_type == 'uuid':
+            user_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+        else:
+            user_id = i + 1
+        yield user_id, name, f'example{i or ""}@{domain}'
+
+
+def setup_database(rows=4, seed=0, id_type='integer', domain='example.com',
+                   db_filename=DB_FILENAME, batch_size=BATCH_SIZE):
+    """
+    Recreate db_filename with a users table of rows generated users.
+    The load runs in one transaction of batched executemany calls with the
+    journal and fsyncs switched off, which is safe because a failed load
+    just gets rerun; the file is left in the normal rollback-journal mode.
+    Returns the load rate in rows/sec.
+    """
+    if id_type not in ID_TYPES:
+        raise ValueError(f"Unknown id type {id_type}, expected one of {sorted(ID_TYPES)}")
+    if os.path.exists(db_filename):
+        os.remove(db_filename)  # Remove existing database for a fresh setup
+
+    start = time.perf_counter()
+    conn = sqlite3.connect(db_filename, isolation_level=None)
+    try:
+        conn.execute('PRAGMA journal_mode = OFF')
+        conn.execute('PRAGMA synchronous = OFF')
+        conn.execute('BEGIN')
+        conn.execute(f'''
+            CREATE TABLE users (
+                id {ID_TYPES[id_type]},
+                name TEXT NOT NULL,
+                email TEXT NOT NULL UNIQUE
+            )
+        ''')
+        users = generate_users(rows, seed, id_type, domain)
+        for batch in iter(lambda: list(islice(users, batch_size)), []):
+            conn.executemany('INSERT INTO users (id, name, email) VALUES (?, ?, ?)', batch)
+        conn.execute('COMMIT')
+        conn.execute('PRAGMA journal_mode = DELETE')
+    finally:
+        conn.close()
+    elapsed = time.perf_counter() - start
+    rate = rows / elapsed if elapsed else 0.0
+    print(f"Database setup complete: {rows} users in {elapsed:.2f}s ({rate:.0f} rows/sec).")
+    return rate
+
 
 def setup_database_log_queries():
     """Set up a SQLite database with a users table and sample data."""
-    db_filename = 'users.db'
-    if os.path.exists(db_filename):
-        os.remove(db_filename)  # Remove existing database for a fresh setup
+    setup_database(rows=3, id_type='uuid', domain='gmail.com')
 
-    conn = sqlite3.connect(db_filename)
-    cursor = conn.cursor()
-
-    # Create users table
-    cursor.execute('''
-        CREATE TABLE users (
-            id TEXT PRIMARY KEY,
-            name TEXT NOT NULL,
-            email TEXT NOT NULL UNIQUE
-        )
-    ''')
-
-    # Insert sample data
-    users = [
-        (str(uuid.uuid4()), 'Alice', 'example@gmail.com'),
-        (str(uuid.uuid4()), 'Bob', 'example2@gmail.com'),
-        (str(uuid.uuid4()), 'Charlie', 'example3@gm,ail.com')
-    ]
-    cursor.executemany('INSERT INTO users (id, name, email) VALUES (?, ?, ?)', users)
-    conn.commit()
-    conn.close()
 
 def setup_database_connection():
     """Set up a SQLite database with a users table and sample data."""
-    db_filename = 'users.db'
-    if os.path.exists(db_filename):
-        os.remove(db_filename)  # Remove existing database for a fresh setup
+    setup_database(id_type='integer', domain='connection.com')
 
-    conn = sqlite3.connect(db_filename)
-    cursor = conn.cursor()
-
-    # Create users table
-    cursor.execute('''
-        CREATE TABLE users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            email TEXT NOT NULL UNIQUE
-        )
-    ''')
-
-    # Insert sample data
-    users = [
-        ('Alice', 'examle@connection.com'),
-        ('Bob', 'example1@connection.com'),
-        ('Charlie', 'example2@connection.com'),
-        ('David', 'example3@connection.com')
-    ]
-    cursor.executemany('INSERT INTO users (name, email) VALUES (?, ?)', users)
-    conn.commit()
-    conn.close()
-    print("Database setup complete.")
 
 def setup_database_transactions():
     """Set up a SQLite database with a users table and sample data."""
-    db_filename = 'users.db'
-    if os.path.exists(db_filename):
-        os.remove(db_filename)  # Remove existing database for a fresh setup
-
-    conn = sqlite3.connect(db_filename)
-    cursor = conn.cursor()
-
-    # Create users table
-    cursor.execute('''
-        CREATE TABLE users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            email TEXT NOT NULL UNIQUE
-        )
-    ''')
-
-    # Insert sample data
-    users = [
-        ('Alice', 'example@transaction.com'),
-        ('Bob', 'example1@transaction.com'),
-        ('Charlie', 'example2@transaction.com'),
-        ('David', 'example3@transaction.com')
-    ]
-    cursor.executemany('INSERT INTO users (name, email) VALUES (?, ?)', users)
-    conn.commit()
-    conn.close()
-    print("Database setup complete.")
+    setup_database(id_type='integer', domain='transaction.com')
 
 
 def setup_database_retry():
     """Set up a SQLite database with a users table and sample data."""
-    db_filename = 'users.db'
-    if os.path.exists(db_filename):
-        os.remove(db_filename)  # Remove existing database for a fresh setup
+    setup_database(id_type='uuid', domain='setup.com')
 
-    conn = sqlite3.connect(db_filename)
-    cursor = conn.cursor()
-
-    # Create users table
-    cursor.execute('''
-        CREATE TABLE users (
-            id TEXT PRIMARY KEY,
-            name TEXT NOT NULL,
-            email TEXT NOT NULL UNIQUE
-        )
-    ''')
-
-    # Insert sample data
-    users = [
-        (str(uuid.uuid4()), 'Alice', 'example@setup.com'),
-        (str(uuid.uuid4()), 'Bob', 'example1@setup.com'),
-        (str(uuid.uuid4()), 'Charlie', 'example2@setup.com'),
-        (str(uuid.uuid4()), 'David', 'example3@setup.com')
-    ]
-    cursor.executemany('INSERT INTO users (id, name, email) VALUES (?, ?, ?)', users)
-    conn.commit()
-    conn.close()
-    print("Database setup complete.")
 
 def setup_database_cache():
     """Set up a SQLite database with a users table and sample data."""
-    db_filename = 'users.db'
-    if os.path.exists(db_filename):
-        os.remove(db_filename)  # Remove existing database for a fresh setup
-
-    conn = sqlite3.connect(db_filename)
-    cursor = conn.cursor()
-
-    # Create users table
-    cursor.execute('''
-        CREATE TABLE users (
-            id TEXT PRIMARY KEY,
-            name TEXT NOT NULL,
-            email TEXT NOT NULL UNIQUE
-        )
-    ''')
-
-    # Insert sample data
-    users = [
-        (str(uuid.uuid4()), 'Alice', 'example@cache.com'),
-        (str(uuid.uuid4()), 'Bob', 'example1@cache.com'),
-        (str(uuid.uuid4()), 'Charlie', 'example2@cache.com'),
-        (str(uuid.uuid4()), 'David', 'example3@cache.com')
-    ]
-    cursor.executemany('INSERT INTO users (id, name, email) VALUES (?, ?, ?)', users)
-    conn.commit()
-    conn.close()
-    print("Database setup complete.")
+    setup_database(id_type='uuid', domain='cache.com')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Generate a users.db for load testing.')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--id-type', choices=sorted(ID_TYPES), default='integer')
+    parser.add_argument('--domain', default='example.com')
+    parser.add_argument('--database', default=DB_FILENAME)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+    setup_database(args.rows, args.seed, args.id_type, args.domain, args.database, args.batch_size)
@@ -2,9 +2,181 @@ import os
 from datetime import datetime
 import sqlite3
 import functools
+import queue
+import threading
+import time
+import weakref
+from contextlib import contextmanager
 
+from statement_cache import CachingConnection, execute_cached
+from transactions import bind, bound_connection, transaction, unbind
 from user_db_setup import setup_database_connection
 
+DB_PATH = 'users.db'
+CONNECT_PRAGMAS = ('synchronous = NORMAL', 'temp_store = MEMORY')
+
+
+class _ThreadConnection:
+    """A per-thread connection and how many borrows of it are open"""
+    def __init__(self, conn):
+        self.conn = conn
+        self.depth = 0
+
+
+class SQLitePool:
+    """
+    Shared SQLite connections for with_db_connection.
+    Either one connection per thread (per_thread=True) or a bounded pool of
+    size connections that callers wait up to timeout seconds for. New
+    connections use journal_mode (WAL by default, so readers do not block
+    the writer), keep cached_statements prepared statements, and run
+    connect_pragmas once; checkout_pragmas run on every checkout. A
+    connection handed back inside a transaction is rolled back first; in
+    per_thread mode only when its outermost borrow on the thread ends, so a
+    nested with_db_connection call cannot undo its caller's work. A
+    per-thread connection is closed once its thread has exited.
+    Connections are CachingConnections, so statements run with
+    execute_cached are counted; stats() sums their cache hits and misses.
+    """
+    def __init__(self, path=DB_PATH, size=5, per_thread=False, timeout=10.0,
+                 cached_statements=256, journal_mode='WAL',
+                 connect_pragmas=CONNECT_PRAGMAS, checkout_pragmas=()):
+        self.path = path
+        self.size = size
+        self.per_thread = per_thread
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self.journal_mode = journal_mode
+        self.connect_pragmas = tuple(connect_pragmas)
+        self.checkout_pragmas = tuple(checkout_pragmas)
+        self.idle = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(size)
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.connections = []
+        self.checkouts = 0
+        self.waits = 0.0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False,
+                               cached_statements=self.cached_statements,
+                               factory=CachingConnection)
+        if self.journal_mode:
+            conn.execute(f'PRAGMA journal_mode = {self.journal_mode}')
+        for pragma in self.connect_pragmas:
+            conn.execute(f'PRAGMA {pragma}')
+        with self.lock:
+            self.connections.append(conn)
+        return conn
+
+    def _discard(self, conn):
+        with self.lock:
+            if conn in self.connections:
+                self.connections.remove(conn)
+        conn.close()
+
+    def acquire(self):
+        start = time.perf_counter()
+        if self.per_thread:
+            borrow = getattr(self.local, 'borrow', None)
+            if borrow is None:
+                borrow = self.local.borrow = _ThreadConnection(self._connect())
+                # the thread's locals are dropped when it exits
+                weakref.finalize(borrow, self._discard, borrow.conn)
+            borrow.depth += 1
+            conn = borrow.conn
+        else:
+            if not self.slots.acquire(timeout=self.timeout):
+                raise sqlite3.OperationalError(
+                    f"no pooled connection available within {self.timeout}s")
+            try:
+                conn = self.idle.get_nowait()
+            except queue.Empty:
+                try:
+                    conn = self._connect()
+                except BaseException:
+                    self.slots.release()
+                    raise
+        for pragma in self.checkout_pragmas:
+            conn.execute(f'PRAGMA {pragma}')
+        with self.lock:
+            self.checkouts += 1
+            self.waits += time.perf_counter() - start
+        return conn
+
+    def release(self, conn):
+        if self.per_thread:
+            borrow = getattr(self.local, 'borrow', None)
+            if borrow is not None and borrow.conn is conn:
+                borrow.depth -= 1
+                if borrow.depth:
+                    return
+            if conn.in_transaction:
+                conn.rollback()
+            return
+        if conn.in_transaction:
+            conn.rollback()
+        self.idle.put(conn)
+        self.slots.release()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self):
+        with self.lock:
+            statements = [conn.statement_stats() for conn in self.connections]
+            return {
+                'mode': 'per_thread' if self.per_thread else 'bounded',
+                'size': self.size,
+                'open': len(self.connections),
+                'idle': self.idle.qsize(),
+                'checkouts': self.checkouts,
+                'avg_checkout_seconds': self.waits / self.checkouts if self.checkouts else 0.0,
+                'statements_cached': sum(s['size'] for s in statements),
+                'statement_hits': sum(s['hits'] for s in statements),
+                'statement_misses': sum(s['misses'] for s in statements),
+            }
+
+    def close(self):
+        """Close every connection the pool opened, e.g. before users.db is recreated"""
+        with self.lock:
+            connections, self.connections = self.connections, []
+        for conn in connections:
+            conn.close()
+        self.idle = queue.LifoQueue()
+        self.local = threading.local()
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.RLock()
+
+
+def configure_pool(**options):
+    """Replace the shared pool; options are SQLitePool arguments"""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.close()
+        _pool = SQLitePool(**options)
+        _pool_pid = os.getpid()
+    return _pool
+
+
+def get_pool():
+    """Return the shared pool, creating it on first use and after a fork"""
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                return configure_pool()
+    return _pool
+
+
 #### decorator to manage DB connection
 def with_db_connection(func):
     """
@@ -14,24 +186,48 @@ def with_db_connection(func):
         - Pass the database connection as the first argument to the decorated function.
         - Ensure the connection is properly closed after the function execution, even if an error occurs.
     Prototype: def with_db_connection()
+    The connection is borrowed from the shared SQLitePool and handed back
+    afterwards instead of being opened and closed on every call. Inside a
+    unit_of_work the connection it bound is passed instead.
     """
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('users.db')
-        try:
+        conn = bound_connection()
+        if conn is not None:
+            return func(conn, *args, **kwargs)
+        with get_pool().connection() as conn:
             return func(conn, *args, **kwargs)
-        finally:
-            conn.close()
     return wrapper
 
 
+@contextmanager
+def unit_of_work():
+    """
+    Group many with_db_connection/transactional calls into one transaction:
+    a pooled connection is bound to this thread for the block, every
+    decorated call on the thread reuses it (transactional ones as
+    savepoints), and the block commits once at the end, or rolls back.
+    Nested unit_of_work blocks become savepoints of the outer one.
+    """
+    conn = bound_connection()
+    if conn is not None:
+        with transaction(conn):
+            yield conn
+        return
+    with get_pool().connection() as conn:
+        bind(conn)
+        try:
+            with transaction(conn):
+                yield conn
+        finally:
+            unbind()
+
+
 
-@with_db_connection 
-def get_user_by_id(conn, user_id): 
-    cursor = conn.cursor() 
-    cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,)) 
-    return cursor.fetchone() 
-#### Fetch user by ID with automatic connection handling 
+@with_db_connection
+def get_user_by_id(conn, user_id):
+    return execute_cached(conn, "SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
+#### Fetch user by ID with automatic connection handling
 
 
 if __name__ == "__main__":
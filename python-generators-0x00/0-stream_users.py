@@ -1,30 +1,34 @@
 #!/usr/bin/env python3
 
+from functools import partial
 from mysql.connector import Error
-from seed import connect_to_prodev
+from seed import pooled_connection, open_cursor
 """
 write a function that uses a generator to fetch rows one by one from the user_data table.
 You must use the Yield python generator
     Prototype: def stream_users()
     Your function should have no more than 1 loop
+
+By default the cursor is unbuffered, so rows stay on the server and are pulled
+chunk_size at a time; memory stays flat however large user_data grows.
+Pass buffered=True to get the old behaviour of loading the whole result first.
+row_format='tuple' or 'record' yields tuples or namedtuples instead of dicts.
 """
 
-def stream_users():
+STREAM_CHUNK_SIZE = 1000
+
+
+def stream_users(chunk_size=STREAM_CHUNK_SIZE, buffered=False, row_format='dict'):
     query = 'SELECT * FROM user_data'
-    connection = connect_to_prodev()
-    
     try:
-        with connection.cursor(dictionary=True, buffered=True) as cursor:
+        with pooled_connection() as connection:
+            cursor = open_cursor(connection, row_format, buffered)
             cursor.execute(query)
-            for row in cursor:
-                yield row
+            for rows in iter(partial(cursor.fetchmany, chunk_size), []):
+                yield from rows
     except Error as e:
         print(f"MySQL Error: ", {e})
-    finally:
-        if connection and connection.is_connected():
-            connection.close()
 
 if __name__ == "__main__":
     stream_users()
 
-
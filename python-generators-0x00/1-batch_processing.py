@@ -5,39 +5,150 @@ Write a function that stream user in batches (batch size) that fetch row in batc
 write a function that process each batch to filter user over the age of 25
 you must not used more than 3 loops in the code
 the script must use yield generator
-prototype: 
+prototype:
         def stream_users_in_batches(batch_size)
         def batch_processing(batch_size)
+
+Pass prefetch=N to keep up to N batches fetched ahead by a background thread,
+so the database round trip of the next batch overlaps with processing of the
+current one.
+
+batch_processing pushes its age filter into the SQL WHERE clause. Pass a
+query_builder.Query to select other columns or filters; only callables given
+to Query.where() are evaluated in Python, and they receive rows in the
+requested row_format ('dict', 'tuple' or 'record').
+
+With a checkpoint.Checkpoint the scan runs in user_id order and records the
+last user_id of every batch the consumer has finished; resume=True continues
+after the saved key. A database error then ends the scan by raising, and
+the saved key is kept; it is only cleared once the scan has run to the end.
 """
 
-from seed import connect_to_prodev
+from functools import partial
+from operator import attrgetter, itemgetter
+from queue import Queue, Full
+from threading import Event, Thread
+from seed import pooled_connection, open_cursor
+from query_builder import Query, col
 from mysql.connector import Error
 
-def stream_users_in_batches(batch_size):
-    query = 'SELECT * FROM user_data'
-    connection = connect_to_prodev()
-    
+_DONE = object()
+ADULTS_OVER_25 = Query('user_data').where(col('age') > 25)
+
+
+def read_batches(batch_size, query=None, row_format='dict'):
+    """Fetch the query's rows batch_size at a time, raising any database error"""
+    sql, params = (query or Query('user_data')).sql()
+    with pooled_connection() as connection:
+        cursor = open_cursor(connection, row_format)
+        cursor.execute(sql, params)
+        yield from iter(partial(cursor.fetchmany, batch_size), [])
+
+
+def fetch_batches(batch_size, query=None, row_format='dict'):
+    """Fetch the query's rows batch_size at a time on the calling thread"""
     try:
-        with connection.cursor(dictionary=True, buffered=True) as cursor:
-            cursor.execute(query)
-            while True:
-                batch = cursor.fetchmany(batch_size)
-                if not batch:
-                    break
-                yield batch
+        yield from read_batches(batch_size, query, row_format)
     except Error as e:
         print(f"MySQL Error: ", {e})
+
+
+def prefetch_batches(batches, depth):
+    """Drive a batch generator on a background thread, keeping depth batches queued
+
+    The producer blocks once depth batches are waiting, and stops (closing the
+    wrapped generator, which hands its connection back) as soon as the consumer
+    closes this generator. Errors raised while fetching are re-raised here.
+    """
+    queue = Queue(maxsize=depth)
+    stop = Event()
+
+    def offer(item):
+        while not stop.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                pass
+        return False
+
+    def produce():
+        outcome = _DONE
+        try:
+            for batch in batches:
+                if not offer(batch):
+                    break
+        except Exception as e:
+            outcome = e
+        finally:
+            batches.close()
+        offer(outcome)
+
+    producer = Thread(target=produce, name='prefetch-batches', daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = queue.get()
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        producer.join()
+
+
+def user_id_getter(query, row_format):
+    """Return a function reading user_id from the query's rows"""
+    if query.columns and 'user_id' not in query.columns:
+        raise ValueError("Checkpointed scans must select user_id")
+    if row_format == 'dict':
+        return itemgetter('user_id')
+    if row_format == 'record':
+        return attrgetter('user_id')
+    return itemgetter(query.columns.index('user_id') if query.columns else 0)
+
+
+def stream_users_in_batches(batch_size, prefetch=0, query=None, row_format='dict',
+                            checkpoint=None, resume=False):
+    query = query or Query('user_data')
+    if checkpoint:
+        key_of = user_id_getter(query, row_format)
+        last_id = checkpoint.load() if resume else None
+        query = query.ordered_by('user_id')
+        if last_id:
+            query = query.where(col('user_id') > last_id)
+    # a checkpointed scan must see database errors, or a scan cut short
+    # would look finished and clear its saved position
+    read = read_batches if checkpoint else fetch_batches
+    batches = read(batch_size, query, row_format)
+    if prefetch:
+        batches = prefetch_batches(batches, prefetch)
+    if not checkpoint:
+        yield from batches
+        return
+    try:
+        for batch in batches:
+            yield batch
+            checkpoint.update(key_of(batch[-1]))
+        checkpoint.clear()
     finally:
-        if connection and connection.is_connected():
-            connection.close()
+        batches.close()
+        checkpoint.flush()
     return
 
-def batch_processing(batch_size):
-    for batch in stream_users_in_batches(batch_size):
+def batch_processing(batch_size, prefetch=0, query=ADULTS_OVER_25, row_format='dict',
+                     checkpoint=None, resume=False):
+    batches = stream_users_in_batches(batch_size, prefetch, query, row_format, checkpoint, resume)
+    for batch in batches:
         if not batch:
             print("No batch found")
+        if not query.predicates:
+            yield from batch
+            continue
         for user in batch:
-            if user.get('age', 0) > 25:
+            if query.matches(user):
                 yield user
     return
 
@@ -11,24 +11,60 @@ paginate_users(page_size, offset) that will only fetch the next page when needed
     You must use the yield generator
     Prototype:
     def lazy_paginate(page_size)
+
+lazy_paginate seeks on the user_id primary key by default, so every page is an
+index range scan no matter how deep it is, and all pages share one connection
+borrowed from the seed pool.
+Pass seek=False to page with LIMIT/OFFSET through paginate_users instead.
+A checkpoint.Checkpoint records the last user_id of every consumed page, and
+resume=True restarts a seek scan after the saved key.
 """
 
-def paginate_users(page_size, offset):
-    connection = seed.connect_to_prodev()
+def paginate_users(page_size, offset, connection=None):
+    if connection is None:
+        with seed.pooled_connection() as connection:
+            return paginate_users(page_size, offset, connection)
+    cursor = connection.cursor(dictionary=True)
+    cursor.execute('SELECT * FROM user_data LIMIT %s OFFSET %s', (page_size, offset))
+    rows = cursor.fetchall()
+    cursor.close()
+    return rows
+
+def paginate_users_after(connection, page_size, last_id=''):
+    """Fetch the page of users whose user_id sorts after last_id"""
     cursor = connection.cursor(dictionary=True)
-    cursor.execute(f'SELECT * FROM user_data LIMIT {page_size} OFFSET {offset}')
+    cursor.execute(
+        'SELECT * FROM user_data WHERE user_id > %s ORDER BY user_id LIMIT %s',
+        (last_id, page_size)
+    )
     rows = cursor.fetchall()
     cursor.close()
     return rows
 
-def lazy_paginate(page_size):
+def lazy_paginate(page_size, seek=True, checkpoint=None, resume=False):
+    if checkpoint and not seek:
+        raise ValueError("Checkpoints need seek pagination")
     offset = 0
-    while True:
-        rows = paginate_users(page_size, offset)
-        if not rows:
-            break
-        yield rows
-        offset += page_size
+    last_id = (checkpoint.load() if checkpoint and resume else None) or ''
+    try:
+        with seed.pooled_connection() as connection:
+            while True:
+                if seek:
+                    rows = paginate_users_after(connection, page_size, last_id)
+                else:
+                    rows = paginate_users(page_size, offset, connection)
+                if not rows:
+                    break
+                yield rows
+                offset += page_size
+                last_id = rows[-1]['user_id']
+                if checkpoint:
+                    checkpoint.update(last_id)
+        if checkpoint:
+            checkpoint.clear()
+    finally:
+        if checkpoint:
+            checkpoint.flush()
     return None
 
 if __name__ == "__main__":
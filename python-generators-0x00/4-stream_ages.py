@@ -2,6 +2,7 @@
 """You are not allowed to use the SQL AVERAGE task"""
 
 from mysql.connector import Error
+from stream_stats import RunningStats, aggregate
 seed = __import__('seed')
 
 """
@@ -19,25 +20,17 @@ You are not allowed to use the SQL AVERAGE
 
 def stream_user_ages():
     query = 'SELECT age FROM user_data'
-    connection = seed.connect_to_prodev()
-    
     try:
-        with connection.cursor(dictionary=True, buffered=True) as cursor:
+        with seed.pooled_connection() as connection:
+            cursor = seed.open_cursor(connection, 'tuple')
             cursor.execute(query)
-            for row in cursor:
-                yield row.get('age', 0)
+            for (age,) in cursor:
+                yield age
     except Error as e:
         print(f"MySQL Error: ", {e})
-    finally:
-        if connection and connection.is_connected():
-            connection.close()
     return
 
 if __name__ == "__main__":
-    total_age = 0
-    count = 0
-    for age in stream_user_ages():
-        total_age += age
-        count += 1
-    average_age = total_age / count if count > 0 else 0
+    stats, = aggregate(stream_user_ages(), RunningStats())
+    average_age = stats.mean
     print(f"Average age of users: {average_age}")
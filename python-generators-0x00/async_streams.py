@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+asyncio counterparts of the user_data generators.
+
+mysql.connector is blocking, so each stream runs its synchronous generator on
+a worker thread and hands results to the event loop through an asyncio.Queue,
+bounded by a semaphore the worker takes a slot of for every item. The loop
+never blocks on the database, several streams can run side by side, and
+prefetch keeps the same meaning as in stream_users_in_batches: how many
+items the worker may fetch ahead.
+
+    async for user in astream_users():
+        ...
+"""
+
+import asyncio
+import threading
+
+stream_users_in_batches = __import__('1-batch_processing').stream_users_in_batches
+lazy_paginate = __import__('2-lazy_paginate').lazy_paginate
+
+_DONE = object()
+
+
+async def iterate_in_thread(generator, prefetch=1):
+    """Drive a blocking generator on a thread and yield its items asynchronously
+
+    At most prefetch items wait in the queue, so a slow consumer holds the
+    worker back. Leaving the async for early (break, exception or task
+    cancellation) stops the worker, which then closes the generator on its
+    own thread so its connection goes back to the pool.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    slots = threading.Semaphore(max(prefetch, 1))
+    stop = threading.Event()
+
+    def offer(item):
+        # each item is handed over exactly once: wait for a free slot, then
+        # schedule a non-blocking put on the loop
+        while not stop.is_set():
+            if slots.acquire(timeout=0.1):
+                try:
+                    loop.call_soon_threadsafe(queue.put_nowait, item)
+                except RuntimeError:
+                    return False
+                return True
+        return False
+
+    def produce():
+        outcome = _DONE
+        try:
+            for item in generator:
+                if not offer(item):
+                    break
+        except Exception as e:
+            outcome = e
+        finally:
+            generator.close()
+        offer(outcome)
+
+    worker = loop.run_in_executor(None, produce)
+    try:
+        while True:
+            item = await queue.get()
+            slots.release()
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        await asyncio.shield(worker)
+
+
+async def astream_users(chunk_size=1000, row_format='dict', prefetch=1):
+    """Async version of stream_users; rows cross to the loop chunk_size at a time"""
+    chunks = stream_users_in_batches(chunk_size, row_format=row_format)
+    async for rows in iterate_in_thread(chunks, prefetch):
+        for row in rows:
+            yield row
+
+
+async def astream_users_in_batches(batch_size, prefetch=1, query=None, row_format='dict'):
+    """Async version of stream_users_in_batches"""
+    batches = stream_users_in_batches(batch_size, query=query, row_format=row_format)
+    async for batch in iterate_in_thread(batches, prefetch):
+        yield batch
+
+
+async def alazy_paginate(page_size, seek=True, prefetch=1):
+    """Async version of lazy_paginate"""
+    async for page in iterate_in_thread(lazy_paginate(page_size, seek), prefetch):
+        yield page
+
+
+async def main():
+    async def count(stream):
+        return sum([1 async for _ in stream])
+
+    users, batches, pages = await asyncio.gather(
+        count(astream_users()),
+        count(astream_users_in_batches(100, prefetch=2)),
+        count(alazy_paginate(100)),
+    )
+    print(f"Streamed {users} users, {batches} batches and {pages} pages concurrently")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Benchmark harness for the user_data access patterns.
+
+A SQLite file stands in for MySQL: SQLiteStandIn mimics the small part of
+the mysql.connector API the generators use, and is installed as the seed
+pool's connection factory, so stream_users, stream_users_in_batches,
+lazy_paginate and stream_user_ages run unmodified. Each scenario runs in a
+fresh interpreter so its peak RSS is its own. Results are written as JSON,
+which can be diffed between releases:
+
+    ./benchmark.py --rows 1000000 --sizes 100,1000,10000 --output bench.json
+
+Per scenario the report has rows, seconds, rows_per_sec, time_to_first_row,
+peak_rss_kib and round_trips (executes plus fetch calls, each of which is a
+trip to the server with a real MySQL connection).
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from collections import namedtuple
+from functools import lru_cache
+
+seed = __import__('seed')
+
+DEFAULT_ROWS = 100_000
+DEFAULT_SIZES = (100, 1000, 10000)
+ITER_CHUNK = 1000
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS user_data (
+        user_id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        email TEXT NOT NULL,
+        age INTEGER NOT NULL
+    )
+'''
+
+
+@lru_cache(maxsize=None)
+def _record_type(columns):
+    return namedtuple('Row', columns)
+
+
+class StandInCursor:
+    """A sqlite3 cursor speaking mysql.connector's paramstyle and row formats"""
+
+    def __init__(self, connection, row_format):
+        self.connection = connection
+        self.row_format = row_format
+        self.cursor = connection.raw.cursor()
+        self.convert = None
+
+    def execute(self, query, params=()):
+        SQLiteStandIn.round_trips += 1
+        query = query.replace('%s', '?').replace('INSERT IGNORE', 'INSERT OR IGNORE')
+        self.cursor.execute(query, tuple(params or ()))
+        self.connection.unread_result = self.cursor.description is not None
+        columns = tuple(d[0] for d in self.cursor.description or ())
+        if self.row_format == 'dict':
+            self.convert = lambda rows: [dict(zip(columns, row)) for row in rows]
+        elif self.row_format == 'record':
+            self.convert = lambda rows: list(map(_record_type(columns)._make, rows))
+        else:
+            self.convert = None
+
+    def executemany(self, query, seq_params):
+        SQLiteStandIn.round_trips += 1
+        query = query.replace('%s', '?').replace('INSERT IGNORE', 'INSERT OR IGNORE')
+        self.cursor.executemany(query, seq_params)
+
+    def fetchmany(self, size=1):
+        SQLiteStandIn.round_trips += 1
+        rows = self.cursor.fetchmany(size)
+        if len(rows) < size:
+            self.connection.unread_result = False
+        return self.convert(rows) if self.convert else rows
+
+    def fetchall(self):
+        SQLiteStandIn.round_trips += 1
+        rows = self.cursor.fetchall()
+        self.connection.unread_result = False
+        return self.convert(rows) if self.convert else rows
+
+    def fetchone(self):
+        rows = self.fetchmany(1)
+        return rows[0] if rows else None
+
+    def __iter__(self):
+        for rows in iter(lambda: self.fetchmany(ITER_CHUNK), []):
+            yield from rows
+
+    @property
+    def rowcount(self):
+        return self.cursor.rowcount
+
+    def close(self):
+        self.cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class SQLiteStandIn:
+    """Just enough of a mysql.connector connection for the generators module"""
+
+    round_trips = 0
+
+    def __init__(self, path):
+        self.raw = sqlite3.connect(path, check_same_thread=False)
+        self.unread_result = False
+
+    def cursor(self, buffered=False, dictionary=False, named_tuple=False):
+        row_format = 'dict' if dictionary else 'record' if named_tuple else 'tuple'
+        return StandInCursor(self, row_format)
+
+    @property
+    def in_transaction(self):
+        return self.raw.in_transaction
+
+    def is_connected(self):
+        return True
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def close(self):
+        self.raw.close()
+
+    shutdown = close
+
+
+def seed_database(path, rows):
+    """Create the stand-in database with rows synthetic users, if not already there"""
+    connection = SQLiteStandIn(path)
+    try:
+        connection.raw.execute(SCHEMA)
+        (current,) = connection.raw.execute('SELECT COUNT(*) FROM user_data').fetchone()
+        if current < rows:
+            seed.insert_synthetic_data(connection, rows - current, start=current, batch_size=10000)
+    finally:
+        connection.close()
+
+
+def scenarios(sizes):
+    """Every (pattern, params) pair to measure"""
+    yield 'stream_users', {}
+    yield 'stream_user_ages', {}
+    for size in sizes:
+        yield 'stream_users', {'chunk_size': size}
+        yield 'stream_users_in_batches', {'batch_size': size}
+        yield 'stream_users_in_batches', {'batch_size': size, 'prefetch': 2}
+        yield 'lazy_paginate', {'page_size': size}
+        yield 'lazy_paginate', {'page_size': size, 'seek': False}
+
+
+def open_pattern(pattern, params):
+    """Return (iterator, rows per item) for an access pattern"""
+    if pattern == 'stream_users':
+        return __import__('0-stream_users').stream_users(**params), None
+    if pattern == 'stream_users_in_batches':
+        return __import__('1-batch_processing').stream_users_in_batches(**params), len
+    if pattern == 'lazy_paginate':
+        return __import__('2-lazy_paginate').lazy_paginate(**params), len
+    if pattern == 'stream_user_ages':
+        return __import__('4-stream_ages').stream_user_ages(**params), None
+    raise ValueError(f"Unknown access pattern {pattern}")
+
+
+def measure(path, pattern, params):
+    """Run one scenario in this process and return its metrics"""
+    seed.configure_pool(factory=lambda: SQLiteStandIn(path))
+    iterator, size_of = open_pattern(pattern, params)
+    rows = 0
+    first = None
+    start = time.perf_counter()
+    for item in iterator:
+        if first is None:
+            first = time.perf_counter() - start
+        rows += size_of(item) if size_of else 1
+    elapsed = time.perf_counter() - start
+    return {
+        'pattern': pattern,
+        'params': params,
+        'rows': rows,
+        'seconds': elapsed,
+        'rows_per_sec': rows / elapsed if elapsed else None,
+        'time_to_first_row': first,
+        'peak_rss_kib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'round_trips': SQLiteStandIn.round_trips,
+    }
+
+
+def run(rows, sizes, path):
+    seed_database(path, rows)
+    results = []
+    for pattern, params in scenarios(sizes):
+        output = subprocess.run(
+            [sys.executable, __file__, '--database', path,
+             '--measure', json.dumps([pattern, params])],
+            capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{pattern:>24} {json.dumps(params):<38} {result['rows_per_sec'] or 0:>12.0f} rows/s",
+              file=sys.stderr)
+        results.append(result)
+    return {
+        'backend': 'sqlite-stand-in',
+        'table_rows': rows,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rows', type=int, default=DEFAULT_ROWS)
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='comma separated chunk, batch and page sizes')
+    parser.add_argument('--database', help='SQLite file to seed and reuse')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    parser.add_argument('--measure', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        pattern, params = json.loads(args.measure)
+        print(json.dumps(measure(args.database, pattern, params)))
+        return
+
+    path = args.database or os.path.join(tempfile.gettempdir(), f'user_data_{args.rows}.sqlite3')
+    sizes = [int(size) for size in args.sizes.split(',')]
+    report = json.dumps(run(args.rows, sizes, path), indent=2)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(report + '\n')
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
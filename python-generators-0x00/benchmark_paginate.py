@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Compare page latency of LIMIT/OFFSET and keyset pagination at growing depths.
+
+For every offset the key of the row just before it is looked up once, then
+both strategies fetch the same page size REPEAT times over one connection.
+
+    usage: ./benchmark_paginate.py [page_size]
+"""
+
+import sys
+import time
+
+seed = __import__('seed')
+lazy = __import__('2-lazy_paginate')
+
+OFFSETS = (0, 100_000, 1_000_000)
+REPEAT = 20
+
+
+def key_before(connection, offset):
+    """Return the user_id just before the given offset in key order"""
+    if offset == 0:
+        return ''
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT user_id FROM user_data ORDER BY user_id LIMIT 1 OFFSET %s',
+            (offset - 1,)
+        )
+        return cursor.fetchone()[0]
+
+
+def timed(fetch):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        fetch()
+    return (time.perf_counter() - start) / REPEAT * 1000
+
+
+def run(page_size):
+    connection = seed.connect_to_prodev()
+    if connection is None:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT COUNT(*) FROM user_data')
+        current = cursor.fetchone()[0]
+    needed = OFFSETS[-1] + page_size
+    if current < needed:
+        seed.insert_synthetic_data(connection, needed - current, start=current)
+
+    print(f"{'offset':>10} {'OFFSET ms':>10} {'keyset ms':>10}")
+    for offset in OFFSETS:
+        last_id = key_before(connection, offset)
+        offset_ms = timed(lambda: lazy.paginate_users(page_size, offset, connection))
+        seek_ms = timed(lambda: lazy.paginate_users_after(connection, page_size, last_id))
+        print(f"{offset:>10} {offset_ms:>10.2f} {seek_ms:>10.2f}")
+    connection.close()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100)
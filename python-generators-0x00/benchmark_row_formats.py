@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Compare dict, tuple and record rows from stream_users.
+
+Throughput streams the whole table; memory per row materialises the first
+SAMPLE rows under tracemalloc and divides the retained size by the row count.
+
+    usage: ./benchmark_row_formats.py [sample]
+"""
+
+import sys
+import time
+import tracemalloc
+from itertools import islice
+
+seed = __import__('seed')
+stream_users = __import__('0-stream_users').stream_users
+
+SAMPLE = 100_000
+
+
+def throughput(row_format):
+    start = time.perf_counter()
+    count = sum(1 for _ in stream_users(row_format=row_format))
+    elapsed = time.perf_counter() - start
+    return count, count / elapsed if elapsed else 0
+
+
+def bytes_per_row(row_format, sample):
+    tracemalloc.start()
+    rows = list(islice(stream_users(row_format=row_format), sample))
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return retained / len(rows) if rows else 0
+
+
+def run(sample):
+    print(f"{'format':>8} {'rows':>10} {'rows/sec':>12} {'bytes/row':>10}")
+    for row_format in seed.ROW_FORMATS:
+        count, rate = throughput(row_format)
+        size = bytes_per_row(row_format, sample)
+        print(f"{row_format:>8} {count:>10} {rate:>12.0f} {size:>10.0f}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else SAMPLE)
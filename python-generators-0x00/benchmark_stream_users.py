@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Compare peak memory of buffered and unbuffered stream_users as user_data grows.
+
+Each measurement runs in a fresh interpreter so ru_maxrss is the peak of that
+run alone. The table is topped up with synthetic rows between sizes.
+
+    usage: ./benchmark_stream_users.py [size ...]
+"""
+
+import resource
+import subprocess
+import sys
+import time
+
+seed = __import__('seed')
+
+SIZES = (10_000, 100_000, 1_000_000)
+
+
+def measure(buffered):
+    """Stream the whole table once and print rows, seconds and peak RSS (KiB)"""
+    stream_users = __import__('0-stream_users').stream_users
+    start = time.perf_counter()
+    count = sum(1 for _ in stream_users(buffered=buffered))
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(count, elapsed, peak)
+
+
+def table_size(connection):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT COUNT(*) FROM user_data')
+        return cursor.fetchone()[0]
+
+
+def run(sizes):
+    connection = seed.connect_to_prodev()
+    if connection is None:
+        return
+    print(f"{'rows':>10} {'mode':>10} {'seconds':>9} {'peak RSS MiB':>13}")
+    for size in sizes:
+        current = table_size(connection)
+        if current < size:
+            seed.insert_synthetic_data(connection, size - current, start=current)
+        for mode in ('buffered', 'unbuffered'):
+            output = subprocess.run(
+                [sys.executable, __file__, '--measure', mode],
+                capture_output=True, text=True, check=True
+            ).stdout.split()
+            rows, elapsed, peak = int(output[-3]), float(output[-2]), int(output[-1])
+            print(f"{rows:>10} {mode:>10} {elapsed:>9.2f} {peak / 1024:>13.1f}")
+    connection.close()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ['--measure']:
+        measure(sys.argv[2] == 'buffered')
+    else:
+        run([int(size) for size in sys.argv[1:]] or SIZES)
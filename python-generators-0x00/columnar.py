@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Column-oriented export of user_data batches to a memory-mappable file.
+
+ColumnarWriter turns row batches (for example from stream_users_in_batches)
+into row groups. Each group stores every column contiguously: numbers as a
+packed array, strings dictionary-encoded as an array of codes plus the
+distinct values, each stored once. ColumnarReader memory-maps the file and
+hands numeric columns back as memoryviews over the mapping, so downstream
+jobs scan them without re-querying MySQL or copying.
+
+File layout (native byte order, recorded in the footer):
+
+    b'UCOL0001' | column chunks, 8-byte aligned, per row group |
+    JSON footer | footer length (8 bytes, little endian) | b'UCOL0001'
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+MAGIC = b'UCOL0001'
+ROW_GROUP_SIZE = 65536
+USER_SCHEMA = (
+    ('user_id', 'string'),
+    ('name', 'string'),
+    ('email', 'string'),
+    ('age', 'int32'),
+)
+NUMERIC_TYPES = {'int32': 'i', 'int64': 'q', 'float64': 'd'}
+CODE_TYPE = 'I'
+OFFSET_TYPE = 'Q'
+
+
+class _StringColumn:
+    """Dictionary-encodes a string column: codes per row, each value stored once"""
+
+    def __init__(self):
+        self.codes = array(CODE_TYPE)
+        self.index = {}
+
+    def append(self, value):
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.index)
+        self.codes.append(code)
+
+
+class ColumnarWriter:
+    """Write row batches to a columnar file, one row group per row_group_size rows
+
+    Used as a context manager, an exception inside the block aborts the
+    export and deletes the file instead of writing a footer that would make
+    a partial export look complete.
+    """
+
+    def __init__(self, path, schema=USER_SCHEMA, row_group_size=ROW_GROUP_SIZE):
+        for name, kind in schema:
+            if kind != 'string' and kind not in NUMERIC_TYPES:
+                raise ValueError(f"Unsupported column type {kind!r} for {name}")
+        self.schema = tuple(schema)
+        self.names = [name for name, _ in self.schema]
+        self.row_group_size = row_group_size
+        self.row_groups = []
+        self.rows = 0
+        self.path = path
+        self.file = open(path, 'wb')
+        self.file.write(MAGIC)
+        self._reset()
+
+    def _reset(self):
+        self.columns = [
+            _StringColumn() if kind == 'string' else array(NUMERIC_TYPES[kind])
+            for _, kind in self.schema
+        ]
+        self.pending = 0
+
+    def _write_block(self, data):
+        padding = -self.file.tell() % 8
+        self.file.write(b'\0' * padding)
+        offset = self.file.tell()
+        self.file.write(data)
+        return [offset, len(data)]
+
+    def write_batch(self, rows):
+        """Append rows given as dicts or as tuples in schema order"""
+        for row in rows:
+            values = [row[name] for name in self.names] if isinstance(row, dict) else row
+            for column, (_, kind), value in zip(self.columns, self.schema, values):
+                if kind == 'string':
+                    column.append(value)
+                elif kind == 'float64':
+                    column.append(float(value))
+                else:
+                    column.append(int(value))
+            self.pending += 1
+            if self.pending >= self.row_group_size:
+                self.flush()
+
+    def flush(self):
+        """Write buffered rows out as a row group"""
+        if not self.pending:
+            return
+        group = {'rows': self.pending, 'columns': {}}
+        for column, (name, kind) in zip(self.columns, self.schema):
+            if kind == 'string':
+                encoded = [value.encode('utf-8') for value in column.index]
+                offsets = array(OFFSET_TYPE, [0])
+                for value in encoded:
+                    offsets.append(offsets[-1] + len(value))
+                group['columns'][name] = {
+                    'codes': self._write_block(column.codes.tobytes()),
+                    'offsets': self._write_block(offsets.tobytes()),
+                    'values': self._write_block(b''.join(encoded)),
+                }
+            else:
+                group['columns'][name] = {'data': self._write_block(column.tobytes())}
+        self.row_groups.append(group)
+        self.rows += self.pending
+        self._reset()
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.flush()
+        footer = json.dumps({
+            'schema': self.schema,
+            'byteorder': sys.byteorder,
+            'rows': self.rows,
+            'row_groups': self.row_groups,
+        }).encode('utf-8')
+        self.file.write(footer)
+        self.file.write(struct.pack('<Q', len(footer)))
+        self.file.write(MAGIC)
+        self.file.close()
+
+    def abort(self):
+        """Stop writing and delete the unfinished file"""
+        if self.file.closed:
+            return
+        self.file.close()
+        os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def export_batches(batches, path, schema=USER_SCHEMA, row_group_size=ROW_GROUP_SIZE):
+    """Pipeline stage: write every batch of a batch stream to path, returning the row count"""
+    with ColumnarWriter(path, schema, row_group_size) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+    return writer.rows
+
+
+class ColumnarReader:
+    """Memory-mapped access to a file written by ColumnarWriter
+
+    The memoryviews handed out by numbers() and dictionaries() point into
+    the mapping and are only valid until the reader is closed; use them
+    inside the with block. If some are still held at close(), the file is
+    closed anyway and the mapping is released with the last of them.
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.map)
+        if self.map[:8] != MAGIC or self.map[-8:] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a columnar user_data file")
+        (length,) = struct.unpack('<Q', self.map[-16:-8])
+        meta = json.loads(self.map[-16 - length:-16])
+        if meta['byteorder'] != sys.byteorder:
+            self.close()
+            raise ValueError(f"{path} was written with {meta['byteorder']}-endian byte order")
+        self.schema = dict(meta['schema'])
+        self.rows = meta['rows']
+        self.row_groups = meta['row_groups']
+
+    def _block(self, location, typecode=None):
+        offset, length = location
+        block = self.view[offset:offset + length]
+        return block.cast(typecode) if typecode else block
+
+    def numbers(self, name):
+        """Yield one zero-copy memoryview per row group of a numeric column"""
+        typecode = NUMERIC_TYPES[self.schema[name]]
+        for group in self.row_groups:
+            yield self._block(group['columns'][name]['data'], typecode)
+
+    def dictionaries(self, name):
+        """Yield (distinct values, codes memoryview) per row group of a string column"""
+        if self.schema[name] != 'string':
+            raise ValueError(f"{name} is not a string column")
+        for group in self.row_groups:
+            chunk = group['columns'][name]
+            offsets = self._block(chunk['offsets'], OFFSET_TYPE)
+            values = self._block(chunk['values'])
+            distinct = [
+                str(values[offsets[i]:offsets[i + 1]], 'utf-8')
+                for i in range(len(offsets) - 1)
+            ]
+            yield distinct, self._block(chunk['codes'], CODE_TYPE)
+
+    def column(self, name):
+        """Yield every value of a column in row order"""
+        if self.schema[name] == 'string':
+            for distinct, codes in self.dictionaries(name):
+                for code in codes:
+                    yield distinct[code]
+        else:
+            for numbers in self.numbers(name):
+                yield from numbers
+
+    def close(self):
+        try:
+            self.view.release()
+            self.map.close()
+        except BufferError:
+            pass
+        finally:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+if __name__ == "__main__":
+    stream_users_in_batches = __import__('1-batch_processing').stream_users_in_batches
+    path = sys.argv[1] if len(sys.argv) > 1 else 'user_data.ucol'
+    rows = export_batches(stream_users_in_batches(5000, prefetch=2, row_format='tuple'), path)
+    with ColumnarReader(path) as reader:
+        total = sum(sum(ages) for ages in reader.numbers('age'))
+    print(f"Exported {rows} users to {path}; average age {total / rows if rows else 0}")
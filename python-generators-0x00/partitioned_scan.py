@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Parallel range-partitioned scans of user_data.
+
+The user_id keys are split into contiguous ranges of about equal row counts,
+with bounds read from the table itself: keys loaded with MySQL's UUID() are
+time-prefixed and bunch together, so an even split of the hex keyspace would
+leave most ranges empty. Each range is scanned in key order over its own
+connection, so K ranges keep K server threads busy. Threads borrow from the
+shared seed pool and hold their connection until their range is done (in an
+ordered scan, until the consumer has drained the ranges before it), so more
+concurrent ranges than pool slots would leave the rest timing out. Such
+calls are rejected: size the pool with seed.configure_pool(size=K) first.
+
+scan_partitions() merges the rows of every range into one generator, in
+key order when ordered=True. map_partitions() runs a function over each
+range's rows on a thread or process pool and returns the per-range results,
+which suits full-table jobs such as the age aggregation. A range that fails
+to connect or errors mid-scan raises in the consumer rather than silently
+contributing fewer rows:
+
+    parts = map_partitions(age_stats, partitions=8, processes=True)
+    total = functools.reduce(RunningStats.merge, parts)
+"""
+
+import sys
+import seed
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from queue import Queue, Full
+from threading import Event, Thread
+
+from query_builder import Query, col
+from stream_stats import RunningStats, aggregate
+
+batches = __import__('1-batch_processing')
+
+_DONE = object()
+BOUND_QUERY = 'SELECT user_id FROM user_data ORDER BY user_id LIMIT 1 OFFSET %s'
+
+
+def key_ranges(partitions):
+    """Split user_data into partitions [low, high) key ranges of about equal size
+
+    The bounds are the keys at every 1/partitions of the table in key order,
+    each a single index lookup. The first low is '' and the last high is
+    None, so together the ranges cover every possible key, including rows
+    inserted after the bounds were read. A table with fewer rows than
+    partitions gives fewer ranges.
+    """
+    if partitions < 1:
+        raise ValueError("partitions must be at least 1")
+    bounds = []
+    with seed.pooled_connection() as connection:
+        with seed.open_cursor(connection, 'tuple', buffered=True) as cursor:
+            cursor.execute('SELECT COUNT(*) FROM user_data')
+            (count,) = cursor.fetchone()
+            for i in range(1, partitions):
+                offset = count * i // partitions
+                if offset == 0:
+                    continue
+                cursor.execute(BOUND_QUERY, (offset,))
+                row = cursor.fetchone()
+                if row and (not bounds or row[0] > bounds[-1]):
+                    bounds.append(row[0])
+    return list(zip([''] + bounds, bounds + [None]))
+
+
+def _check_pool(concurrent):
+    """Refuse to run more ranges at once than the shared pool has connections"""
+    size = seed.get_pool().size
+    if concurrent > size:
+        raise ValueError(f"{concurrent} concurrent partitions need {concurrent} pooled "
+                         f"connections but the pool has {size}; "
+                         f"call seed.configure_pool(size={concurrent}) first")
+
+
+def partition_query(query, low, high):
+    """Restrict query to user_id in [low, high), in key order"""
+    conditions = []
+    if low:
+        conditions.append(col('user_id') >= low)
+    if high is not None:
+        conditions.append(col('user_id') < high)
+    return query.where(*conditions).ordered_by('user_id')
+
+
+def scan_partition(low, high, query=None, batch_size=1000, row_format='dict'):
+    """Yield the rows of one key range over its own pooled connection"""
+    query = partition_query(query or Query('user_data'), low, high)
+    for batch in batches.read_batches(batch_size, query, row_format):
+        for row in batch:
+            if query.matches(row):
+                yield row
+
+
+def scan_partitions(partitions=4, query=None, batch_size=1000, row_format='dict',
+                    ordered=False, depth=4):
+    """Scan all key ranges concurrently on threads and yield their rows
+
+    Each range keeps at most depth batches queued. Unordered output takes
+    batches as they arrive; ordered output drains the ranges one after the
+    other while later ranges keep fetching ahead. Closing the generator stops
+    every worker and returns their connections to the pool.
+    """
+    query = query or Query('user_data')
+    _check_pool(partitions)
+    ranges = key_ranges(partitions)
+    shared = Queue(maxsize=depth * partitions)
+    queues = [Queue(maxsize=depth) for _ in ranges] if ordered else [shared] * len(ranges)
+    stop = Event()
+
+    def offer(queue, item):
+        while not stop.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                pass
+        return False
+
+    def produce(queue, low, high):
+        outcome = _DONE
+        fetched = batches.read_batches(batch_size, partition_query(query, low, high), row_format)
+        try:
+            for batch in fetched:
+                if not offer(queue, batch):
+                    break
+        except Exception as e:
+            outcome = e
+        finally:
+            fetched.close()
+        offer(queue, outcome)
+
+    workers = [
+        Thread(target=produce, args=(queue, low, high), name=f'scan-{low or "start"}', daemon=True)
+        for queue, (low, high) in zip(queues, ranges)
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        remaining = len(workers)
+        current = 0
+        while remaining:
+            item = queues[current].get()
+            if item is _DONE:
+                remaining -= 1
+                current += ordered
+                continue
+            if isinstance(item, Exception):
+                raise item
+            for row in item:
+                if query.matches(row):
+                    yield row
+    finally:
+        stop.set()
+        for worker in workers:
+            worker.join()
+
+
+def _run_partition(func, low, high, query, batch_size, row_format):
+    return func(scan_partition(low, high, query, batch_size, row_format))
+
+
+def map_partitions(func, partitions=4, query=None, batch_size=1000, row_format='dict',
+                   processes=False, max_workers=None):
+    """Apply func to the row stream of every key range, in parallel
+
+    func receives an iterator of rows and its return values come back in
+    key range order. With processes=True the ranges run in worker processes,
+    so func, query and the results must be picklable: use a module-level
+    function, no lambda predicates, and 'dict' or 'tuple' rows. Worker
+    threads share the seed pool, which must have a connection for each of
+    them; worker processes each open their own pool.
+    """
+    executor_class = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    if not processes:
+        _check_pool(min(max_workers or partitions, partitions))
+    ranges = key_ranges(partitions)
+    with executor_class(max_workers=max_workers or partitions) as executor:
+        futures = [
+            executor.submit(_run_partition, func, low, high, query, batch_size, row_format)
+            for low, high in ranges
+        ]
+        return [future.result() for future in futures]
+
+
+def age_stats(rows):
+    """Aggregate the age column of tuple rows selected as ('age',)"""
+    return aggregate((age for (age,) in rows), RunningStats())[0]
+
+
+if __name__ == "__main__":
+    partitions = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    parts = map_partitions(age_stats, partitions, Query('user_data').select('age'),
+                           row_format='tuple', processes=True)
+    total = RunningStats()
+    for part in parts:
+        total.merge(part)
+    print(f"Average age of users: {total.mean} over {total.count} rows in {partitions} partitions")
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Composable filters and projections for the user_data generators.
+
+Simple predicates built from col() are compiled into the SQL WHERE clause and
+column selections into the SELECT list, so MySQL does the filtering. Plain
+Python callables are still accepted and are applied to each row client side.
+
+    query = Query('user_data').select('name', 'age').where(col('age') > 25)
+    sql, params = query.sql()
+"""
+
+import re
+
+_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+def quote(name):
+    """Return name as a backquoted identifier, rejecting anything unusual"""
+    if not _IDENTIFIER.match(name):
+        raise ValueError(f"Invalid column or table name: {name!r}")
+    return f'`{name}`'
+
+
+class Condition:
+    """A SQL boolean expression with its bound parameters"""
+
+    def __init__(self, sql, params=()):
+        self.text = sql
+        self.params = tuple(params)
+
+    def __and__(self, other):
+        return Condition(f'({self.text} AND {other.text})', self.params + other.params)
+
+    def __or__(self, other):
+        return Condition(f'({self.text} OR {other.text})', self.params + other.params)
+
+    def __invert__(self):
+        return Condition(f'(NOT {self.text})', self.params)
+
+    def __repr__(self):
+        return f'Condition({self.text!r}, {self.params!r})'
+
+
+class Column:
+    """A column reference; comparison operators build Conditions"""
+
+    def __init__(self, name):
+        self.name = name
+        self.sql = quote(name)
+
+    def _compare(self, operator, value):
+        return Condition(f'{self.sql} {operator} %s', (value,))
+
+    def __eq__(self, value):
+        if value is None:
+            return self.is_null()
+        return self._compare('=', value)
+
+    def __ne__(self, value):
+        if value is None:
+            return ~self.is_null()
+        return self._compare('<>', value)
+
+    def __lt__(self, value):
+        return self._compare('<', value)
+
+    def __le__(self, value):
+        return self._compare('<=', value)
+
+    def __gt__(self, value):
+        return self._compare('>', value)
+
+    def __ge__(self, value):
+        return self._compare('>=', value)
+
+    __hash__ = None
+
+    def isin(self, values):
+        values = tuple(values)
+        if not values:
+            return Condition('FALSE')
+        placeholders = ', '.join(['%s'] * len(values))
+        return Condition(f'{self.sql} IN ({placeholders})', values)
+
+    def between(self, low, high):
+        return Condition(f'{self.sql} BETWEEN %s AND %s', (low, high))
+
+    def like(self, pattern):
+        return self._compare('LIKE', pattern)
+
+    def is_null(self):
+        return Condition(f'{self.sql} IS NULL')
+
+
+def col(name):
+    """Shorthand for Column(name)"""
+    return Column(name)
+
+
+class Query:
+    """An immutable SELECT over one table with pushed-down and client-side filters"""
+
+    def __init__(self, table='user_data', columns=None, conditions=(), predicates=(), order_by=None):
+        self.table = table
+        self.columns = tuple(columns) if columns else None
+        self.conditions = tuple(conditions)
+        self.predicates = tuple(predicates)
+        self.order_by = order_by
+
+    def _replace(self, **changes):
+        fields = dict(table=self.table, columns=self.columns, conditions=self.conditions,
+                      predicates=self.predicates, order_by=self.order_by)
+        fields.update(changes)
+        return Query(**fields)
+
+    def select(self, *columns):
+        """Restrict the SELECT list to the given columns"""
+        return self._replace(columns=columns)
+
+    def where(self, *filters):
+        """Add filters: Conditions go to SQL, callables run on each fetched row
+
+        Columns read by a callable must be part of the selection.
+        """
+        conditions = [f for f in filters if isinstance(f, Condition)]
+        predicates = [f for f in filters if not isinstance(f, Condition)]
+        if any(not callable(p) for p in predicates):
+            raise TypeError("where() takes Conditions or callables")
+        return self._replace(conditions=self.conditions + tuple(conditions),
+                             predicates=self.predicates + tuple(predicates))
+
+    def ordered_by(self, column):
+        return self._replace(order_by=column)
+
+    def sql(self):
+        """Compile to a (statement, params) pair for cursor.execute"""
+        columns = ', '.join(quote(c) for c in self.columns) if self.columns else '*'
+        statement = f'SELECT {columns} FROM {quote(self.table)}'
+        params = ()
+        if self.conditions:
+            statement += ' WHERE ' + ' AND '.join(c.text for c in self.conditions)
+            params = sum((c.params for c in self.conditions), ())
+        if self.order_by:
+            statement += f' ORDER BY {quote(self.order_by)}'
+        return statement, params
+
+    def matches(self, row):
+        """Apply the client-side predicates to a fetched row"""
+        return all(predicate(row) for predicate in self.predicates)
+
+    def __repr__(self):
+        return f'Query({self.sql()!r}, predicates={len(self.predicates)})'
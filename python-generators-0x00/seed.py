@@ -1,8 +1,16 @@
 #!/usr/bin/env python3
 
 import csv
+import os
+import random
+import threading
+import time
 import uuid
+from collections import deque
+from contextlib import contextmanager
+from itertools import islice
 from mysql.connector import connect, Error
+from mysql.connector.errors import PoolError
 
 DB_HOST = 'localhost'
 DB_USER = 'root'
@@ -30,9 +38,10 @@ def create_database(connection):
         print(e)
 
 
-def connect_to_prodev():
+def connect_to_prodev(**options):
+    """Connect to the ALX_prodev database, passing extra options to connect()"""
     try:
-        conn = connect(host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=DB_NAME)
+        conn = connect(host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=DB_NAME, **options)
         print("Connected to ALX_prodev database")
         return conn
     except Error as e:
@@ -40,6 +49,206 @@ def connect_to_prodev():
         return None
 
 
+ROW_FORMATS = ('dict', 'tuple', 'record')
+
+
+def open_cursor(connection, row_format='dict', buffered=False):
+    """Open a cursor whose rows are dicts, plain tuples or namedtuple records
+
+    Tuples are the cheapest; records are tuples too, with one namedtuple
+    class per column list shared by every row, so they read like
+    row.age without a dict per row.
+    """
+    if row_format not in ROW_FORMATS:
+        raise ValueError(f"row_format must be one of {ROW_FORMATS}")
+    return connection.cursor(
+        buffered=buffered,
+        dictionary=row_format == 'dict',
+        named_tuple=row_format == 'record',
+    )
+
+
+def close_connection(connection):
+    """Close a connection, discarding any unread rows of a streaming query
+
+    An unbuffered cursor leaves its result set on the server until every row
+    is read. Closing politely would drain the rest of the table first, so a
+    consumer that stops early gets the socket shut down instead.
+    """
+    if connection is None:
+        return
+    if connection.unread_result:
+        connection.shutdown()
+    elif connection.is_connected():
+        connection.close()
+
+
+POOL_SIZE = 10
+POOL_MAX_LIFETIME = 1800
+POOL_CHECKOUT_TIMEOUT = 10
+POOL_PING_AFTER = 30
+
+
+class ConnectionPool:
+    """A bounded pool of ALX_prodev connections
+
+    At most size connections are checked out at once; acquire() waits up to
+    checkout_timeout seconds for a free slot and raises PoolError otherwise.
+    Idle connections older than max_lifetime are replaced, and ones idle for
+    more than ping_after seconds are pinged before being handed out.
+    Connections returned with unread streaming rows are discarded, and open
+    transactions are rolled back so no stale snapshot leaks to the next user.
+    """
+
+    def __init__(self, factory=None, size=POOL_SIZE, max_lifetime=POOL_MAX_LIFETIME,
+                 checkout_timeout=POOL_CHECKOUT_TIMEOUT, ping_after=POOL_PING_AFTER):
+        self.factory = factory or connect_to_prodev
+        self.size = size
+        self.max_lifetime = max_lifetime
+        self.checkout_timeout = checkout_timeout
+        self.ping_after = ping_after
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._idle = deque()
+        self._born = {}
+        self.in_use = 0
+        self.created = 0
+        self.discarded = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _discard(self, connection):
+        with self._lock:
+            self._born.pop(id(connection), None)
+            self.discarded += 1
+        try:
+            close_connection(connection)
+        except Error:
+            pass
+
+    def _checkout_idle(self):
+        """Return a usable idle connection, or None when none is left"""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                connection, last_used = self._idle.pop()
+                born = self._born.get(id(connection), 0)
+            now = time.monotonic()
+            if now - born > self.max_lifetime:
+                self._discard(connection)
+            elif now - last_used > self.ping_after and not connection.is_connected():
+                self._discard(connection)
+            else:
+                return connection
+
+    def acquire(self):
+        start = time.monotonic()
+        if not self._slots.acquire(timeout=self.checkout_timeout):
+            with self._lock:
+                self.timeouts += 1
+            raise PoolError(f"No connection available within {self.checkout_timeout}s")
+        try:
+            connection = self._checkout_idle()
+            if connection is None:
+                connection = self.factory()
+                if connection is None:
+                    raise PoolError("Could not open a new connection")
+                with self._lock:
+                    self._born[id(connection)] = time.monotonic()
+                    self.created += 1
+        except BaseException:
+            self._slots.release()
+            raise
+        waited = time.monotonic() - start
+        with self._lock:
+            self.in_use += 1
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+        return connection
+
+    def release(self, connection):
+        try:
+            if connection.unread_result or not connection.is_connected():
+                self._discard(connection)
+            else:
+                if connection.in_transaction:
+                    connection.rollback()
+                with self._lock:
+                    self._idle.append((connection, time.monotonic()))
+        except Error:
+            self._discard(connection)
+        finally:
+            with self._lock:
+                self.in_use -= 1
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of a with block"""
+        connection = self.acquire()
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': self.size,
+                'in_use': self.in_use,
+                'idle': len(self._idle),
+                'created': self.created,
+                'discarded': self.discarded,
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'wait_avg': self.wait_total / self.checkouts if self.checkouts else 0.0,
+                'wait_max': self.wait_max,
+            }
+
+    def close(self):
+        """Close every idle connection; checked out ones close on release"""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return
+                connection, _ = self._idle.pop()
+            self._discard(connection)
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.RLock()
+
+
+def configure_pool(**options):
+    """Replace the shared pool with one built from ConnectionPool options"""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.close()
+        _pool = ConnectionPool(**options)
+        _pool_pid = os.getpid()
+    return _pool
+
+
+def get_pool():
+    """Return the shared pool, creating a fresh one in forked child processes"""
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                return configure_pool()
+    return _pool
+
+
+def pooled_connection():
+    """Borrow an ALX_prodev connection from the shared pool: with pooled_connection() as conn"""
+    return get_pool().connection()
+
+
 def create_table(connection):
     """Create user_data table if it does not exist"""
     query = '''CREATE TABLE IF NOT EXISTS user_data (
@@ -58,21 +267,95 @@ def create_table(connection):
         print(e)
 
 
-def insert_data(connection, data):
-    """Insert CSV rows into user_data table with UUIDs"""
+INSERT_BATCH_SIZE = 1000
+
+
+def read_user_rows(data):
+    """Yield (user_id, name, email, age) tuples from the CSV one at a time"""
+    with open(data, newline='', encoding='utf-8') as csvfile:
+        for row in csv.DictReader(csvfile):
+            yield (str(uuid.uuid4()), row['name'], row['email'], row['age'])
+
+
+def load_data_infile(connection, data):
+    """Bulk load the CSV with LOAD DATA LOCAL INFILE, generating UUIDs server side
+
+    The connection must be opened with allow_local_infile=True and the server
+    must have local_infile enabled. Returns the number of rows inserted.
+    """
+    query = '''
+        LOAD DATA LOCAL INFILE %s IGNORE INTO TABLE user_data
+        FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"'
+        LINES TERMINATED BY '\\n'
+        IGNORE 1 LINES
+        (name, email, age)
+        SET user_id = UUID()
+    '''
+    with connection.cursor() as cursor:
+        cursor.execute(query, (os.path.abspath(data),))
+        connection.commit()
+        return cursor.rowcount
+
+
+def insert_data(connection, data, batch_size=INSERT_BATCH_SIZE, local_infile=False):
+    """Insert CSV rows into user_data table with UUIDs
+
+    Rows are streamed from the CSV and sent batch_size at a time as one
+    multi-row INSERT, committing after every batch. With local_infile=True
+    LOAD DATA LOCAL INFILE is tried first, falling back to batched inserts
+    when the client or server does not allow it.
+    """
+    query = '''
+        INSERT IGNORE INTO user_data (user_id, name, email, age)
+        VALUES (%s, %s, %s, %s)
+    '''
+    start = time.perf_counter()
+    inserted = None
+    if local_infile:
+        try:
+            inserted = load_data_infile(connection, data)
+        except Error as e:
+            print(f"LOAD DATA LOCAL INFILE unavailable, using batched inserts:", e)
     try:
-        with open(data, newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
+        if inserted is None:
+            inserted = 0
+            rows = read_user_rows(data)
             with connection.cursor() as cursor:
-                for row in reader:
-                    query = '''
-                        INSERT IGNORE INTO user_data (user_id, name, email, age)
-                        VALUES (%s, %s, %s, %s)
-                    '''
-                    values = (str(uuid.uuid4()), row['name'], row['email'], row['age'])
-                    cursor.execute(query, values)
-                connection.commit()
+                for batch in iter(lambda: list(islice(rows, batch_size)), []):
+                    cursor.executemany(query, batch)
+                    connection.commit()
+                    inserted += len(batch)
     except Error as e:
         print(f"MySQL Error:", e)
+        return
     except FileNotFoundError:
         print(f"CSV file {data} not found")
+        return
+    elapsed = time.perf_counter() - start
+    rate = inserted / elapsed if elapsed else 0
+    print(f"Inserted {inserted} rows in {elapsed:.2f}s ({rate:.0f} rows/sec)")
+
+
+def insert_synthetic_data(connection, count, start=0, batch_size=1000):
+    """Insert count generated rows into user_data, for benchmarks
+
+    Rows are numbered from start and derived from it, so topping a table up
+    in several calls never produces duplicate keys.
+    """
+    query = '''
+        INSERT IGNORE INTO user_data (user_id, name, email, age)
+        VALUES (%s, %s, %s, %s)
+    '''
+    rng = random.Random(start)
+    try:
+        with connection.cursor() as cursor:
+            for first in range(start, start + count, batch_size):
+                rows = [
+                    (str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+                     f'User {n}', f'user{n}@example.com', rng.randint(18, 99))
+                    for n in range(first, min(first + batch_size, start + count))
+                ]
+                cursor.executemany(query, rows)
+                connection.commit()
+    except Error as e:
+        print(f"MySQL Error:", e)
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+One-pass streaming aggregates for generator pipelines.
+
+Every aggregator takes values through push(), reports through result() and can
+absorb another aggregator of the same kind with merge(), so shards of a table
+can be aggregated concurrently and combined afterwards. Memory use does not
+grow with the number of values pushed (the t-digest grows logarithmically).
+
+    stats, ages = aggregate(stream_user_ages(), RunningStats(), TDigest())
+    print(stats.mean, ages.quantile(0.5))
+"""
+
+import math
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+
+
+class RunningStats:
+    """Count, min, max, mean and variance using Welford's algorithm"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def push(self, value):
+        value = float(value)
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        """Fold another RunningStats in (Chan et al. parallel update)"""
+        if not other.count:
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def variance(self):
+        """Sample variance, 0.0 with fewer than two values"""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def stddev(self):
+        return math.sqrt(self.variance)
+
+    def result(self):
+        return {
+            'count': self.count,
+            'mean': self.mean if self.count else None,
+            'variance': self.variance,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None,
+        }
+
+
+class TDigest:
+    """Approximate quantiles with a merging t-digest
+
+    Higher compression keeps more centroids, trading memory for accuracy; the
+    centroid count grows only logarithmically with the number of values.
+    Unlike P-square estimators, digests built on separate shards merge
+    without losing accuracy.
+    """
+
+    def __init__(self, compression=100):
+        self.compression = compression
+        self.centroids = []
+        self.buffer = []
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def push(self, value, weight=1):
+        value = float(value)
+        self.buffer.append((value, weight))
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self.buffer) >= 5 * self.compression:
+            self._compress()
+
+    def _compress(self):
+        if not self.buffer:
+            return
+        points = sorted(self.centroids + self.buffer)
+        self.buffer = []
+        total = self.total = sum(weight for _, weight in points)
+        merged = []
+        before = 0.0
+        for mean, weight in points:
+            if merged:
+                last_mean, last_weight = merged[-1]
+                q = (before + (last_weight + weight) / 2) / total
+                if last_weight + weight <= max(1.0, 4 * total * q * (1 - q) / self.compression):
+                    combined = last_weight + weight
+                    merged[-1] = (last_mean + (mean - last_mean) * weight / combined, combined)
+                    continue
+                before += last_weight
+            merged.append((mean, weight))
+        self.centroids = merged
+
+    def merge(self, other):
+        other._compress()
+        self.buffer.extend(other.centroids)
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def quantile(self, q):
+        """Estimate the q-th quantile (0 <= q <= 1), None when empty"""
+        self._compress()
+        if not self.centroids:
+            return None
+        target = q * self.total
+        previous_mean, previous_position = self.min, 0.0
+        position = 0.0
+        for mean, weight in self.centroids:
+            center = position + weight / 2
+            if target < center:
+                span = center - previous_position
+                fraction = (target - previous_position) / span if span else 0.0
+                return previous_mean + (mean - previous_mean) * fraction
+            previous_mean, previous_position = mean, center
+            position += weight
+        span = self.total - previous_position
+        fraction = (target - previous_position) / span if span else 1.0
+        return previous_mean + (self.max - previous_mean) * fraction
+
+    def result(self, quantiles=(0.5, 0.9, 0.99)):
+        return {q: self.quantile(q) for q in quantiles}
+
+
+class Histogram:
+    """Counts over equal-width bins between low and high, plus out-of-range tallies"""
+
+    def __init__(self, low, high, bins=10):
+        if high <= low or bins < 1:
+            raise ValueError("Histogram needs low < high and at least one bin")
+        self.low = low
+        self.high = high
+        width = (high - low) / bins
+        self.edges = [low + width * i for i in range(bins + 1)]
+        self.counts = [0] * bins
+        self.underflow = 0
+        self.overflow = 0
+
+    def push(self, value):
+        value = float(value)
+        if value < self.low:
+            self.underflow += 1
+        elif value >= self.high:
+            self.overflow += 1
+        else:
+            index = min(bisect_right(self.edges, value) - 1, len(self.counts) - 1)
+            self.counts[index] += 1
+
+    def merge(self, other):
+        if other.edges != self.edges:
+            raise ValueError("Cannot merge histograms with different bins")
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.underflow += other.underflow
+        self.overflow += other.overflow
+        return self
+
+    def result(self):
+        return {
+            'bins': list(zip(self.edges, self.edges[1:], self.counts)),
+            'underflow': self.underflow,
+            'overflow': self.overflow,
+        }
+
+
+def aggregate(values, *aggregators):
+    """Push every value of the stream into each aggregator, returning them"""
+    for value in values:
+        for aggregator in aggregators:
+            aggregator.push(value)
+    return aggregators
+
+
+def aggregate_shards(shards, factory, max_workers=None):
+    """Aggregate several streams concurrently and merge the partial results
+
+    shards are zero-argument callables returning a stream, so each one opens
+    its own connection on its worker thread. factory returns a fresh tuple of
+    aggregators for each shard; the merged tuple is returned.
+    """
+    def run(shard):
+        return aggregate(shard(), *factory())
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        partials = list(executor.map(run, shards))
+    merged = factory()
+    for partial in partials:
+        for total, part in zip(merged, partial):
+            total.merge(part)
+    return merged
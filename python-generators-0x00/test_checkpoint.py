@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Tests for checkpointed scans, run against the SQLite stand-in of benchmark.py"""
+
+import os
+import tempfile
+import unittest
+
+from mysql.connector import Error
+
+import benchmark
+import seed
+from checkpoint import Checkpoint
+
+stream_users_in_batches = __import__('1-batch_processing').stream_users_in_batches
+
+ROWS = 5000
+BATCH_SIZE = 1000
+
+
+class FailingCursor(benchmark.StandInCursor):
+    """Loses the connection on the third fetch"""
+
+    def fetchmany(self, size=1):
+        self.connection.fetches += 1
+        if self.connection.fetches == 3:
+            raise Error("Lost connection to MySQL server during query")
+        return super().fetchmany(size)
+
+
+class FailingConnection(benchmark.SQLiteStandIn):
+    """A stand-in connection whose cursors fail part way through a scan"""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.fetches = 0
+
+    def cursor(self, buffered=False, dictionary=False, named_tuple=False):
+        row_format = 'dict' if dictionary else 'record' if named_tuple else 'tuple'
+        return FailingCursor(self, row_format)
+
+
+class TestCheckpointedScan(unittest.TestCase):
+    """stream_users_in_batches with a Checkpoint"""
+
+    def setUp(self):
+        """Seed a stand-in database and a fresh checkpoint file"""
+        self.directory = tempfile.TemporaryDirectory()
+        self.database = os.path.join(self.directory.name, 'user_data.sqlite3')
+        benchmark.seed_database(self.database, ROWS)
+        self.checkpoint = Checkpoint('test-scan', os.path.join(self.directory.name, 'cp.db'),
+                                     interval=0)
+
+    def tearDown(self):
+        seed.get_pool().close()
+        self.directory.cleanup()
+
+    def scan(self, factory, resume=False):
+        seed.configure_pool(factory=lambda: factory(self.database))
+        return stream_users_in_batches(BATCH_SIZE, checkpoint=self.checkpoint, resume=resume)
+
+    def test_error_mid_scan_keeps_checkpoint(self):
+        """A database error ends the scan with the error and keeps its position"""
+        delivered = []
+        with self.assertRaises(Error):
+            for batch in self.scan(FailingConnection):
+                delivered.extend(batch)
+        self.assertEqual(len(delivered), 2 * BATCH_SIZE)
+        self.assertEqual(self.checkpoint.load(), delivered[-1]['user_id'])
+
+        resumed = [row for batch in self.scan(benchmark.SQLiteStandIn, resume=True)
+                   for row in batch]
+        self.assertEqual(len(delivered) + len(resumed), ROWS)
+        self.assertIsNone(self.checkpoint.load())
+
+    def test_completed_scan_clears_checkpoint(self):
+        """A scan that runs to the end forgets its position"""
+        rows = sum(len(batch) for batch in self.scan(benchmark.SQLiteStandIn))
+        self.assertEqual(rows, ROWS)
+        self.assertIsNone(self.checkpoint.load())
+
+
+if __name__ == '__main__':
+    unittest.main()